@@ -0,0 +1,116 @@
+import gzip
+import io
+import logging
+import pathlib
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+L = logging.getLogger(__name__)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+# Extension that is added after the .log extension of a compressed log
+COMPRESSION_EXTENSIONS = {
+    COMPRESSION_NONE: "",
+    COMPRESSION_GZIP: ".gz",
+    COMPRESSION_ZSTD: ".zst"
+}
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def get_available_compression(compression):
+    """
+    Returns the compression that can be used, zstd falls back to gzip if the zstandard package is not installed
+    :return: compression name
+    """
+
+    if compression not in COMPRESSION_EXTENSIONS:
+        L.warning("Unknown log compression: %s, storing logs uncompressed", compression)
+        return COMPRESSION_NONE
+
+    if compression == COMPRESSION_ZSTD and not zstandard:
+        L.warning("zstandard is not installed, compressing logs with gzip instead")
+        return COMPRESSION_GZIP
+
+    return compression
+
+
+def is_compressed_log_file(log_file_path):
+
+    log_file_path = str(log_file_path)
+
+    return log_file_path.endswith(COMPRESSION_EXTENSIONS[COMPRESSION_GZIP]) or \
+        log_file_path.endswith(COMPRESSION_EXTENSIONS[COMPRESSION_ZSTD])
+
+
+def open_log_file(log_file_path):
+    """
+    Opens a log for reading as text, compressed logs are decompressed while they are read
+    :return: file object
+    """
+
+    log_file_path = str(log_file_path)
+
+    if log_file_path.endswith(COMPRESSION_EXTENSIONS[COMPRESSION_GZIP]):
+        return gzip.open(log_file_path, "rt", encoding="utf-8", errors="ignore")
+
+    if log_file_path.endswith(COMPRESSION_EXTENSIONS[COMPRESSION_ZSTD]):
+        if not zstandard:
+            raise IOError("zstandard needs to be installed to read: " + log_file_path)
+
+        reader = zstandard.ZstdDecompressor().stream_reader(open(log_file_path, "rb"), closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8", errors="ignore")
+
+    return io.open(log_file_path, encoding="utf-8", errors="ignore")
+
+
+def compress_log_file(source_path, target_path, compression):
+    """
+    Writes a compressed copy of the source log to the target path
+    """
+
+    with open(source_path, "rb") as source_file:
+
+        if compression == COMPRESSION_ZSTD:
+            with open(target_path, "wb") as target_file:
+                zstandard.ZstdCompressor(level=3).copy_stream(source_file, target_file)
+
+        elif compression == COMPRESSION_GZIP:
+            with gzip.open(target_path, "wb", compresslevel=6) as target_file:
+                shutil.copyfileobj(source_file, target_file, COPY_BUFFER_SIZE)
+
+        else:
+            with open(target_path, "wb") as target_file:
+                shutil.copyfileobj(source_file, target_file, COPY_BUFFER_SIZE)
+
+
+def get_other_compression_paths(log_file_path):
+    """
+    :return: paths the same log would have with the other compressions
+    """
+
+    log_file_path = pathlib.Path(log_file_path)
+    uncompressed_name = log_file_path.name
+    for each_extension in COMPRESSION_EXTENSIONS.values():
+        if each_extension and uncompressed_name.endswith(each_extension):
+            uncompressed_name = uncompressed_name[:-len(each_extension)]
+
+    return [log_file_path.with_name(uncompressed_name + each_extension)
+            for each_extension in COMPRESSION_EXTENSIONS.values()
+            if uncompressed_name + each_extension != log_file_path.name]
+
+
+def get_log_hash_value(log_file_path):
+    """
+    Logs are named after the hash value of the package they were extracted from
+    :return: the file name without the log and compression extensions
+    """
+
+    return log_file_path.name.split(".")[0]
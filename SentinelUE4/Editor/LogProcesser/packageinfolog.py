@@ -3,28 +3,78 @@
 import pathlib
 import re
 import logging
+
+from Editor.LogProcesser import logfiles
+
 L = logging.getLogger()
 
+# Stamped into the converted data, has to be raised whenever a change to the parsing changes the data so that json
+# converted by an older parser is converted again
+PARSER_VERSION = 1
+PARSER_VERSION_KEY = "ParserVersion"
+
+CHAPTER_DIVIDER = "--------------------------------------------"
+
+# Start of the first line of the chapters that the data is read from
+PACKAGE_INFO_HEADER = "Filename: "
+PACKAGE_REFERENCES_HEADER = "Packages referenced by "
+ASSET_REGISTRY_HEADER = "Asset Registry Size: "
+
+CHAPTER_HEADERS = (PACKAGE_INFO_HEADER, PACKAGE_REFERENCES_HEADER, ASSET_REGISTRY_HEADER)
+
+# Type of the first asset in the asset registry chapter, 0) Type'/Game/Path.Name'
+ASSET_TYPE_PATTERN = re.compile(r'0\) (.*?)\'')
+
+
+def get_relative_content_path(absolute_path):
+    """
+    Converts an absolute path to a package file to the path relative to the project
+    :return: path starting with /Content/
+    """
+
+    # TODO this needs to know the path to the project so that we can convert this more safely to a relative path
+    part_to_split = "/Content/"
+    rel_path = pathlib.Path(absolute_path).as_posix().split(part_to_split)[1]
+
+    return part_to_split + rel_path
+
 
 class PkgLogObject:
 
     """
     Takes in a raw pkgInfo log file and extracts relevant infomation out of it.  Saves the output file as a json file
+
+    The log is parsed while it is read line by line, only the chapters the data comes from are looked at and their
+    lines are parsed straight into the data.  None of the log is held in memory, no matter how big it is
     """
 
+    # Keys of the data in the order they are written out
+    DATA_KEYS = ["UnrealFileName", "AssetPath", "AssetType", "PackageInfo", "PackageReferences", "AssetRegistry",
+                 "Imports", "Exports"]
+
     def __init__(self, path_to_log):
 
         # Init the dictionary that will hold the cleaned up data
         self.log_dict = {}
 
-        # Save the log path and read the log lines from disk
+        # Save the log path, the log is read from disk when the data is requested
         self.log_file_path = pathlib.Path(path_to_log)
 
         # Saving values
-        self.raw_log_lines = ""
-        self.asset_name = ""
         self.absolute_package_path = ""
-        self._log_chapters = []
+
+        # Data of the chapters while they are being parsed
+        self._package_info = {}
+        self._package_references = {}
+        self._asset_type = ""
+        self._asset_registry = {}
+
+        # Header -> method that parses a line of that chapter
+        self._line_parsers = {
+            PACKAGE_INFO_HEADER: self._parse_package_info_line,
+            PACKAGE_REFERENCES_HEADER: self._parse_package_reference_line,
+            ASSET_REGISTRY_HEADER: self._parse_asset_registry_line
+        }
 
     def _get_absolute_package_path(self):
         """
@@ -32,30 +82,14 @@ class PkgLogObject:
         :return:
         """
 
-        if self.absolute_package_path:
-            return pathlib.Path(self.absolute_package_path)
-
-        # Search through the file for the filename
-        result = None
-        for each_line in self._get_log_lines():
-            result = re.search('.*?Filename: (.*).*', each_line)
-            if result:
-                self.absolute_package_path = result.group(1)
-                break
-
-        if not result:
-            L.error("Unable to find filename in %s", self.log_file_path)
+        if not self.log_dict:
+            self.get_data()
 
         return pathlib.Path(self.absolute_package_path)
 
     def get_relative_package_path(self):
 
-        # TODO this needs to know the path to the project so that we can convert this more safely to a relative path
-        part_to_split = "/Content/"
-        path = self._get_absolute_package_path()
-        rel_path = path.as_posix().split(part_to_split)[1]
-
-        return part_to_split + rel_path
+        return get_relative_content_path(self._get_absolute_package_path())
 
     def get_asset_name(self):
         """
@@ -68,135 +102,196 @@ class PkgLogObject:
         # returns only the name of the asset as it would appear in the engine
         return package_path.stem
 
-    def _get_log_lines(self):
+    def get_data(self):
+
+        if self.log_dict:
+            return self.log_dict
+
+        data = dict(self.iter_data())
+        self.log_dict = {each_key: data[each_key] for each_key in self.DATA_KEYS}
+
+        return self.log_dict
+
+    def iter_data(self, lines=None):
         """
-        Read the logs lines from disk
-        :return: list of lines
+        Parses the log and yields the data of each chapter as soon as the chapter has been read
+        :param lines: optional iterable of log lines, the log is read from disk line by line if not given
+        :return: generator of key and value pairs
         """
 
-        if self.raw_log_lines:
-            return self.raw_log_lines
+        if lines is not None:
+            yield from self._parse_lines(lines)
+            return
 
-        f = open(self.log_file_path, "r", encoding="utf8", errors="ignore")
-        self.raw_log_lines = f.readlines()
-        f.close()
+        # Compressed logs are decompressed while they are read
+        with logfiles.open_log_file(self.log_file_path) as log_file:
+            yield from self._parse_lines(log_file)
 
-        return self.raw_log_lines
+    def _parse_lines(self, lines):
 
-    def get_data(self):
+        self.absolute_package_path = ""
+        self._package_info = {}
+        self._package_references = {}
+        self._asset_type = ""
+        self._asset_registry = {}
 
-        self.log_dict["UnrealFileName"] = self.get_asset_name()
-        self.log_dict["AssetPath"] = self.get_relative_package_path()
-        self.log_dict["AssetType"] = self.get_asset_type()
-        self.log_dict["PackageInfo"] = self.get_package_info()
-        self.log_dict["PackageReferences"] = self.get_package_references()
-        self.log_dict["AssetRegistry"] = self.get_asset_references()
+        parsed_headers = []
+        line_parser = None
+        chapter_header = None
+        is_first_line = True
 
-        self.log_dict["Imports"] = []
-        self.log_dict["Exports"] = []
+        for each_line in lines:
 
-        return self.log_dict
+            if CHAPTER_DIVIDER in each_line:
+                if chapter_header:
+                    yield from self._get_chapter_data(chapter_header)
+
+                line_parser = None
+                chapter_header = None
+                is_first_line = True
+                continue
 
-    def _get_chapter_from_first_line(self, first_line_string):
+            if is_first_line:
+                is_first_line = False
+                chapter_header = self._get_chapter_header(each_line)
 
-        package_info_chapter = []
-        for each_chapter in self.get_log_chapters():
-            first_line = each_chapter[0].lstrip()
+                # Only the first chapter that starts with a header is parsed
+                if chapter_header in parsed_headers:
+                    chapter_header = None
+                elif chapter_header:
+                    parsed_headers.append(chapter_header)
+                    line_parser = self._line_parsers[chapter_header]
 
-            if first_line.startswith(first_line_string):
-                package_info_chapter = each_chapter
-                break
+            if line_parser:
+                line_parser(each_line)
 
-        return package_info_chapter
+        # Adding the last one
+        if chapter_header:
+            yield from self._get_chapter_data(chapter_header)
 
-    def get_package_info(self):
+        # Chapters that are not in the log still get their empty data
+        for each_header in CHAPTER_HEADERS:
+            if each_header not in parsed_headers:
+                yield from self._get_chapter_data(each_header)
+
+        yield "Imports", []
+        yield "Exports", []
+
+    @staticmethod
+    def _get_chapter_header(first_line):
+
+        first_line = first_line.lstrip()
+        for each_header in CHAPTER_HEADERS:
+            if first_line.startswith(each_header):
+                return each_header
+
+        return None
+
+    def _get_chapter_data(self, chapter_header):
         """
-        Formats the package info
-        :return:
+        :return: list of the key and value pairs of the data that comes from the chapter
         """
-        package_info_chapter = self._get_chapter_from_first_line("Filename: ")
 
-        package_info = {}
-        for each_line in package_info_chapter:
-            each_line = each_line.strip()
+        if chapter_header == PACKAGE_INFO_HEADER:
+            if not self.absolute_package_path:
+                L.error("Unable to find filename in %s", self.log_file_path)
 
-            # Skipping empty strings
-            if not each_line:
-                continue
+            package_path = pathlib.Path(self.absolute_package_path)
 
-            split = each_line.split(": ")
-            try:
-                # Adding the first and second part to the package info dict
-                package_info[split[0]] = self._format_value(split[1])
-            except IndexError:
-                L.debug("Data parse not implemented for: %s ", each_line)
+            # The asset name is the name of the package as it would appear in the engine
+            return [("UnrealFileName", package_path.stem),
+                    ("AssetPath", get_relative_content_path(package_path)),
+                    ("PackageInfo", self._package_info)]
 
-        return package_info
+        if chapter_header == PACKAGE_REFERENCES_HEADER:
+            return [("PackageReferences", self._package_references)]
 
-    def get_package_references(self):
+        if not self._asset_type:
+            L.warning("Unable to determine asset type in %s", self.log_file_path)
 
-        package_ref = {}
-        package_info_chapter = self._get_chapter_from_first_line("Packages referenced by ")
+        return [("AssetType", self._asset_type),
+                ("AssetRegistry", self._asset_registry)]
 
-        for each_line in package_info_chapter:
-            each_line = each_line.lstrip().rstrip()
-            line_split = each_line.split(") ")
-            if line_split[0].isnumeric():
-                package_ref[line_split[0]] = line_split[1]
+    def get_package_info(self):
 
-        return package_ref
+        return self.get_data()["PackageInfo"]
 
-    def get_asset_type(self):
-        asset_reference_chapter = self._get_chapter_from_first_line("Asset Registry Size: ")
-        asset_type = ""
-        for each_line in asset_reference_chapter:
-            line = each_line.strip()
-            # Check for the first asset reference to get the type
+    def get_package_references(self):
 
-            asset_match_obj = re.search(r'0\) (.*?)\'', line)
-            if asset_match_obj:
-                asset_type = asset_match_obj.group(1)
-                break
+        return self.get_data()["PackageReferences"]
 
-        if not asset_type:
-            L.warning("Unable to determine asset type from lines: %s ", asset_reference_chapter)
+    def get_asset_type(self):
 
-        return asset_type
+        return self.get_data()["AssetType"]
 
     def get_asset_references(self):
-        asset_reference_chapter = self._get_chapter_from_first_line("Asset Registry Size: ")
+
+        return self.get_data()["AssetRegistry"]
+
+    def _parse_package_info_line(self, line):
+        """
+        Formats the package info
+        :return:
+        """
+
+        # The filename is the first line of the package info chapter
+        if not self.absolute_package_path and PACKAGE_INFO_HEADER in line:
+            self.absolute_package_path = line.split(PACKAGE_INFO_HEADER, 1)[1].rstrip("\n")
+
+        line = line.strip()
+
+        # Skipping empty strings
+        if not line:
+            return
+
+        split = line.split(": ")
+        try:
+            # Adding the first and second part to the package info dict
+            self._package_info[split[0]] = self._format_value(split[1])
+        except IndexError:
+            L.debug("Data parse not implemented for: %s ", line)
+
+    def _parse_package_reference_line(self, line):
+
+        line = line.lstrip().rstrip()
+        line_split = line.split(") ")
+        if line_split[0].isnumeric():
+            self._package_references[line_split[0]] = line_split[1]
+
+    def _parse_asset_registry_line(self, line):
 
         values_to_skip = ["FiBData"]
 
-        asset_reference = {}
-        for each_line in asset_reference_chapter:
-            each_line = each_line.strip()
+        line = line.strip()
 
-            # Skipping empty strings
-            if not each_line:
-                continue
+        # Skipping empty strings
+        if not line:
+            return
 
-            if each_line.startswith("\""):
-                each_line = each_line.replace("\"", "")
-                split = each_line.split(": ")
+        # Check for the first asset reference to get the type
+        if not self._asset_type:
+            asset_match_obj = ASSET_TYPE_PATTERN.search(line)
+            if asset_match_obj:
+                self._asset_type = asset_match_obj.group(1)
 
-                if len(split) > 2:
-                    asset_reference[split[0]] = self._split_complex_asset_data_value(each_line)
-                    continue
-                else:
-                    try:
-                        key = split[0]
-                        value = split[1]
+        if line.startswith("\""):
+            line = line.replace("\"", "")
+            split = line.split(": ")
 
-                        if key in values_to_skip:
-                            continue
+            if len(split) > 2:
+                self._asset_registry[split[0]] = self._split_complex_asset_data_value(line)
+            else:
+                try:
+                    key = split[0]
+                    value = split[1]
 
-                        asset_reference[key] = self._format_value(value)
+                    if key in values_to_skip:
+                        return
 
-                    except IndexError:
-                        print("Unable to parse %s ", each_line)
+                    self._asset_registry[key] = self._format_value(value)
 
-        return asset_reference
+                except IndexError:
+                    print("Unable to parse %s ", line)
 
     def _split_complex_asset_data_value(self, line):
         """
@@ -230,34 +325,6 @@ class PkgLogObject:
 
         return value
 
-    def get_log_chapters(self):
-        """
-        Split the log file into chapters
-        :return:
-        """
-
-        if self._log_chapters:
-            return self._log_chapters
-
-        # Divider
-        chapter_divider = "--------------------------------------------"
-        lines = self._get_log_lines()
-        self._log_chapters = []
-
-        each_chapter = []
-        for line_no, each_raw_line in enumerate(lines):
-
-            if chapter_divider in each_raw_line:
-                self._log_chapters.append(each_chapter)
-                each_chapter = []
-            else:
-                each_chapter.append(each_raw_line)
-            # Collecting Asset Reference
-
-        # Adding the last one
-        self._log_chapters.append(each_chapter)
-        return self._log_chapters
-
 
 class BaseDataParser:
 
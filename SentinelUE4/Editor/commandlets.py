@@ -2,11 +2,13 @@
 import subprocess
 import json
 import os
+import shlex
 import sys
 import logging
 import pathlib
 import Editor.LogProcesser.commandletparsers as commandletparsers
 import ue4_constants
+from Editor import inspectionutilities
 
 if __package__ is None or __package__ == '':
     import editorutilities as editorUtilities
@@ -16,6 +18,50 @@ else:
 
 L = logging.getLogger(__name__)
 
+# Windows limits a command line to 32767 characters, leaving some room for what the os adds
+COMMAND_LINE_LIMIT = 32000
+
+# The engine keeps its command line in a buffer of 16384 characters (MaxCommandLineSize) and cuts off anything longer.
+# The contents of a response file are appended to that same buffer, so passing the files in a response file gets the
+# command past the os limit but not past this one
+ENGINE_COMMAND_LINE_LIMIT = 15000
+
+# Setting in the commandlet config with the argument that makes the engine read more arguments from a file
+RESPONSE_FILE_ARGUMENT = "response_file_argument"
+
+
+def get_command_line_limit(run_config):
+    """
+    Longest command line that commandlets are started with, commandlets with a response file argument pass their
+    files through a file above it.  The engine limit applies on top of this one
+    :return: number of characters, 0 for no limit
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return settings.get(ue4_constants.EXTRACT_COMMAND_LINE_LIMIT, COMMAND_LINE_LIMIT)
+
+
+def get_engine_command_line_limit(run_config):
+    """
+    Longest command line the engine reads in full, including the arguments from a response file
+    :return: number of characters, 0 for no limit
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return settings.get(ue4_constants.EXTRACT_ENGINE_COMMAND_LINE_LIMIT, ENGINE_COMMAND_LINE_LIMIT)
+
+
+def get_process_arguments(command):
+    """
+    Windows takes the command as a single string, everywhere else it needs to be split into arguments
+    :return: command that can be passed to subprocess
+    """
+
+    if os.name == "nt":
+        return command
+
+    return shlex.split(command)
+
 
 def get_commandlet_log_parser(commandlet_name, file_path):
 
@@ -107,10 +153,52 @@ class BaseUE4Commandlet:
         project_file_path = self.editor_util.get_project_file_path().as_posix()
 
         cmd = engine_executable + " " + project_file_path + " " + new_args + " -LOG=" + self.log_file_name + " -UNATTENDED"
+
+        # Moving the file list to a response file when the command would be too long to start the editor
+        command_line_limit = get_command_line_limit(self.run_config)
+        if self.files and command_line_limit and len(cmd) > command_line_limit:
+            if self.supports_response_file():
+                engine_command_line_limit = get_engine_command_line_limit(self.run_config)
+                if engine_command_line_limit and len(cmd) > engine_command_line_limit:
+                    L.warning("Command is %s characters, the engine will cut off the files after %s characters",
+                              len(cmd), engine_command_line_limit)
+
+                response_argument = self._write_response_file(path_string)
+                cmd = cmd.replace(path_string, " " + response_argument, 1)
+                L.info("Command is %s characters, passing %s files through: %s", len(cmd) + len(path_string),
+                       len(self.files), response_argument)
+            else:
+                L.warning("Command is %s characters which is over the command line limit of %s", len(cmd),
+                          command_line_limit)
+
         L.info(cmd)
 
         return cmd
 
+    def supports_response_file(self):
+        """
+        :return: True if the commandlet can read its arguments from a file
+        """
+
+        return bool(self.commandlet_settings.get(RESPONSE_FILE_ARGUMENT, ""))
+
+    def _write_response_file(self, arguments):
+        """
+        Writes the arguments to a file next to the log of the commandlet
+        :return: argument that points the engine at the file
+        """
+
+        response_file_path = self.raw_log_path.joinpath("ResponseFiles",
+                                                        pathlib.Path(self.log_file_name).stem + ".txt")
+
+        if not response_file_path.parent.exists():
+            os.makedirs(response_file_path.parent, exist_ok=True)
+
+        with open(response_file_path, "w", encoding="utf-8") as f:
+            f.write(arguments.strip())
+
+        return self.commandlet_settings[RESPONSE_FILE_ARGUMENT] + '"' + response_file_path.as_posix() + '"'
+
     def _get_file_list_as_strings(self):
 
         path_string = ""
@@ -150,7 +238,8 @@ class BaseUE4Commandlet:
         if not os.path.exists(os.path.dirname(temp_dump_file)):
             os.makedirs(os.path.dirname(temp_dump_file))
 
-        popen = subprocess.Popen(commandlet_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        popen = subprocess.Popen(get_process_arguments(commandlet_command), stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT)
 
         with open(temp_dump_file, "w", encoding='utf-8') as fp:
             for line in popen.stdout:
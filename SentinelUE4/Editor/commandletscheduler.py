@@ -0,0 +1,181 @@
+import concurrent.futures
+import logging
+import os
+import sys
+import threading
+import time
+
+import ue4_constants
+from Editor import inspectionutilities
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+L = logging.getLogger(__name__)
+
+# Memory that a single editor process is expected to use while running a commandlet
+DEFAULT_WORKER_MEMORY_MB = 4096
+
+
+def get_available_memory():
+    """
+    Reads how much memory can be used by new processes without swapping
+    :return: available memory in bytes, 0 if it could not be read
+    """
+
+    if psutil:
+        return psutil.virtual_memory().available
+
+    if sys.platform == "win32":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong),
+                        ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong),
+                        ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong),
+                        ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong),
+                        ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+        return 0
+
+    try:
+        with open("/proc/meminfo") as f:
+            for each_line in f:
+                if each_line.startswith("MemAvailable:"):
+                    return int(each_line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return 0
+
+
+def get_worker_count(run_config):
+    """
+    Works out how many commandlets can run at the same time.  A configured count is used as is, otherwise it is one
+    per core capped by how many editor processes fit in the available memory
+    :return: number of workers
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    worker_count = settings.get(ue4_constants.EXTRACT_WORKERS, 0)
+
+    if worker_count > 0:
+        return worker_count
+
+    worker_count = os.cpu_count() or 1
+
+    worker_memory = settings.get(ue4_constants.EXTRACT_WORKER_MEMORY_MB, DEFAULT_WORKER_MEMORY_MB) * 1024 * 1024
+    available_memory = get_available_memory()
+    if worker_memory and available_memory:
+        memory_worker_count = max(1, available_memory // worker_memory)
+        if memory_worker_count < worker_count:
+            L.info("Limiting extract workers to %s by the available memory: %s MB", memory_worker_count,
+                   available_memory // (1024 * 1024))
+            worker_count = memory_worker_count
+
+    return worker_count
+
+
+class CommandletScheduler:
+    """
+    Runs commandlets on a pool of worker threads, every worker waits on its own editor process so the threads are
+    mostly idle while the editors do the work
+    """
+
+    def __init__(self, worker_count):
+
+        self.worker_count = max(1, worker_count)
+
+        # worker name -> [number of commandlets, seconds spent running them]
+        self.worker_stats = {}
+        self._stats_lock = threading.Lock()
+
+        self._executor = None
+        self._pending_futures = set()
+
+    def _run_commandlet(self, commandlet):
+
+        start_time = time.perf_counter()
+        try:
+            commandlet.run()
+        finally:
+            elapsed_seconds = time.perf_counter() - start_time
+            commandlet.elapsed_seconds = elapsed_seconds
+
+            with self._stats_lock:
+                stats = self.worker_stats.setdefault(threading.current_thread().name, [0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed_seconds
+
+        return commandlet
+
+    def schedule(self, commandlet):
+        """
+        Adds a commandlet to a run that is in progress, used to queue more work while handling a finished commandlet
+        """
+
+        self._pending_futures.add(self._executor.submit(self._run_commandlet, commandlet))
+
+    def cancel(self):
+        """
+        Cancels the commandlets that have not started yet, the ones that are running are left to finish
+        """
+
+        for each_future in self._pending_futures:
+            each_future.cancel()
+
+    def run(self, commandlets):
+        """
+        Runs the commandlets, the finished commandlets are yielded in the order they complete
+        :param commandlets: list of objects with a run method
+        """
+
+        self.worker_stats = {}
+        start_time = time.perf_counter()
+
+        L.info("Running %s commandlets on %s workers", len(commandlets), self.worker_count)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.worker_count,
+                                                   thread_name_prefix="commandlet") as executor:
+            self._executor = executor
+            for each_commandlet in commandlets:
+                self.schedule(each_commandlet)
+
+            finished_count = 0
+            while self._pending_futures:
+                done_futures, self._pending_futures = concurrent.futures.wait(
+                    self._pending_futures, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done_futures:
+                    finished_count += 1
+                    L.info("Finished commandlet %s out of %s", finished_count,
+                           finished_count + len(self._pending_futures))
+                    yield future.result()
+
+            self._executor = None
+
+        self._report_utilization(time.perf_counter() - start_time)
+
+    def _report_utilization(self, elapsed_seconds):
+
+        elapsed_seconds = max(elapsed_seconds, inspectionutilities.MIN_ELAPSED_SECONDS)
+
+        total_busy_seconds = 0.0
+        for each_worker, (commandlet_count, busy_seconds) in sorted(self.worker_stats.items()):
+            total_busy_seconds += busy_seconds
+            L.info("Worker %s: %s commandlets, busy %.1fs of %.1fs (%.0f%%)", each_worker, commandlet_count,
+                   busy_seconds, elapsed_seconds, 100 * busy_seconds / elapsed_seconds)
+
+        L.info("Commandlets finished in %.1fs, worker utilization: %.0f%%", elapsed_seconds,
+               100 * total_busy_seconds / (elapsed_seconds * self.worker_count))
@@ -0,0 +1,337 @@
+import concurrent.futures
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import pathlib
+import sys
+import time
+
+import ue4_constants
+from Editor import inspectionutilities
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+L = logging.getLogger(__name__)
+
+HASH_INDEX_FILE_NAME = "_hash_index.json"
+HASH_INDEX_VERSION = 1
+
+DEFAULT_READ_SIZE = 1024 * 1024
+DEFAULT_MMAP_THRESHOLD = 64 * 1024 * 1024
+
+DEFAULT_HASH_ALGORITHM = "md5"
+
+
+def _get_hash_algorithms():
+    """
+    Collects the algorithms that can be used to hash content
+    :return: dict of algorithm name -> (cache key prefix, hash object constructor)
+    """
+
+    algorithms = {
+        # md5 keys have no prefix so that caches created before the algorithm was selectable stay valid
+        "md5": ("", hashlib.md5),
+        "sha1": ("sha1", hashlib.sha1),
+        "blake2b": ("b2b16", functools.partial(hashlib.blake2b, digest_size=16)),
+    }
+
+    # Non cryptographic hash that is a lot faster but only available if the package is installed
+    if xxhash:
+        algorithms["xxh3"] = ("xxh3", xxhash.xxh3_128)
+
+    return algorithms
+
+
+HASH_ALGORITHMS = _get_hash_algorithms()
+
+
+def _get_hash_algorithm(algorithm):
+
+    if algorithm not in HASH_ALGORITHMS:
+        L.error("Hash algorithm: %s is not available, available algorithms: %s", algorithm,
+                ", ".join(sorted(HASH_ALGORITHMS)))
+        sys.exit(1)
+
+    return HASH_ALGORITHMS[algorithm]
+
+
+def make_cache_key(algorithm, hex_digest):
+    """
+    Prefixes the digest with the algorithm version so that keys from different algorithms can never match
+    :return: cache key
+    """
+
+    prefix = _get_hash_algorithm(algorithm)[0]
+
+    if not prefix:
+        return hex_digest
+
+    return prefix + "-" + hex_digest
+
+
+def get_file_hash(file_path, algorithm=DEFAULT_HASH_ALGORITHM, read_size=DEFAULT_READ_SIZE,
+                  mmap_threshold=DEFAULT_MMAP_THRESHOLD):
+    """
+    Reads a file and generates a hash value for it, large files are memory mapped and hashed in a single call
+    :return: cache key for the content of the file
+    """
+
+    hash_object = _get_hash_algorithm(algorithm)[1]()
+    with open(file_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+
+        if mmap_threshold and file_size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                hash_object.update(mapped_file)
+        else:
+            # Reusing the same buffer for every read to avoid allocating a new bytes object per chunk
+            buffer = bytearray(read_size)
+            view = memoryview(buffer)
+            for read_count in iter(lambda: f.readinto(buffer), 0):
+                hash_object.update(view[:read_count])
+
+    return make_cache_key(algorithm, hash_object.hexdigest())
+
+
+def get_hash_engine(run_config):
+    """
+    Creates the hash engine from the package inspection settings in the run config
+    :return: ContentHashEngine
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+
+    return ContentHashEngine(worker_count=settings.get(ue4_constants.HASH_WORKERS, 0),
+                             use_processes=settings.get(ue4_constants.HASH_USE_PROCESSES, False),
+                             algorithm=settings.get(ue4_constants.HASH_ALGORITHM, DEFAULT_HASH_ALGORITHM),
+                             read_size=settings.get(ue4_constants.HASH_READ_SIZE, DEFAULT_READ_SIZE),
+                             mmap_threshold=settings.get(ue4_constants.HASH_MMAP_THRESHOLD, DEFAULT_MMAP_THRESHOLD))
+
+
+class ContentHashEngine:
+    """
+    Hashes a list of files using a pool of workers.  The largest files are scheduled first so that a few big files
+    don't end up being hashed on their own at the end of the run
+    """
+
+    def __init__(self, worker_count=0, use_processes=False, algorithm=DEFAULT_HASH_ALGORITHM,
+                 read_size=DEFAULT_READ_SIZE, mmap_threshold=DEFAULT_MMAP_THRESHOLD):
+
+        # Validating the algorithm up front instead of inside of the workers
+        _get_hash_algorithm(algorithm)
+
+        self.worker_count = inspectionutilities.get_worker_count(worker_count)
+        self.use_processes = use_processes
+        self.algorithm = algorithm
+        self.read_size = read_size
+        self.mmap_threshold = mmap_threshold
+
+        # Throughput of the last run
+        self.stats = {}
+
+    def _get_executor(self):
+
+        if self.use_processes:
+            return concurrent.futures.ProcessPoolExecutor(max_workers=self.worker_count)
+
+        # hashlib releases the GIL while hashing large buffers so threads scale without the cost of new processes
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.worker_count)
+
+    def hash_files(self, list_of_files):
+        """
+        Generates the hash values for a list of files
+        :param list_of_files: list of paths
+        :return: dict of path -> hash value
+        """
+
+        start_time = time.perf_counter()
+
+        sized_files = []
+        for each_file in list_of_files:
+            sized_files.append((os.path.getsize(each_file), each_file))
+
+        sized_files.sort(key=lambda entry: entry[0], reverse=True)
+        ordered_files = [each_file for size, each_file in sized_files]
+        total_bytes = sum(size for size, each_file in sized_files)
+
+        hash_function = functools.partial(get_file_hash, algorithm=self.algorithm, read_size=self.read_size,
+                                          mmap_threshold=self.mmap_threshold)
+
+        hash_values = {}
+        if self.worker_count == 1 or len(ordered_files) < 2:
+            hash_results = map(hash_function, ordered_files)
+            self._collect_results(ordered_files, hash_results, hash_values)
+        else:
+            with self._get_executor() as executor:
+                # Batching the work for the process pool so the files are not sent over one at a time
+                chunk_size = max(1, min(64, len(ordered_files) // (self.worker_count * 4)))
+                hash_results = executor.map(hash_function, ordered_files, chunksize=chunk_size)
+                self._collect_results(ordered_files, hash_results, hash_values)
+
+        self._report_throughput(len(ordered_files), total_bytes, time.perf_counter() - start_time)
+
+        return hash_values
+
+    @staticmethod
+    def _collect_results(ordered_files, hash_results, hash_values):
+
+        for i, (each_file, hash_value) in enumerate(zip(ordered_files, hash_results)):
+            hash_values[each_file] = hash_value
+
+            if i % 500 == 0:
+                L.info("Generating Hash for %s out of %s", str(i), str(len(ordered_files)))
+
+    def _report_throughput(self, number_of_files, total_bytes, elapsed_seconds):
+
+        megabytes = total_bytes / (1024 * 1024)
+
+        self.stats = {
+            "files": number_of_files,
+            "bytes": total_bytes,
+            **inspectionutilities.get_throughput(elapsed_seconds, mb=megabytes, files=number_of_files),
+            "workers": self.worker_count,
+            "algorithm": self.algorithm
+        }
+
+        L.info("Hashed %s files (%.1f MB) with %s in %.2fs with %s workers: %.1f MB/s, %.1f files/s",
+               number_of_files, megabytes, self.algorithm, elapsed_seconds, self.worker_count,
+               self.stats["mb_per_second"], self.stats["files_per_second"])
+
+
+class FileHashIndex:
+    """
+    On disk index that remembers the hash value of a file together with its stat signature (size, mtime, inode) so
+    that files that have not changed since the last run don't have to be read and hashed again
+    """
+
+    def __init__(self, index_file_path, algorithm=DEFAULT_HASH_ALGORITHM):
+
+        self.index_file_path = pathlib.Path(index_file_path)
+        self.algorithm = algorithm
+
+        self._entries = self._read_index()
+        self._used_paths = set()
+
+        # Keeping track of how much hashing the index saved
+        self.hits = 0
+        self.misses = 0
+
+    def _read_index(self):
+        """
+        Reads the index from disk, a missing or unreadable index is treated as empty and gets rebuilt
+        :return: dict of path -> [size, mtime_ns, inode, hash]
+        """
+
+        if not self.index_file_path.exists():
+            L.info("No hash index found at: %s, starting a new one", self.index_file_path)
+            return {}
+
+        data = inspectionutilities.read_json_file(self.index_file_path, "hash index")
+        if data is None:
+            return {}
+
+        if data.get("version") != HASH_INDEX_VERSION:
+            L.info("Hash index version changed, rebuilding it")
+            return {}
+
+        if data.get("algorithm", DEFAULT_HASH_ALGORITHM) != self.algorithm:
+            L.info("Hash algorithm changed to: %s, rebuilding the hash index", self.algorithm)
+            return {}
+
+        return data.get("files", {})
+
+    @staticmethod
+    def get_stat_signature(file_path):
+        """
+        :return: list with the size, modified time and inode of the file
+        """
+
+        stat = os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def lookup(self, file_path):
+        """
+        Check if the file has an up to date hash value in the index
+        :param file_path: path to the file
+        :return: tuple of the stored hash value (empty if the file changed) and the current stat signature
+        """
+
+        key = str(file_path)
+        self._used_paths.add(key)
+
+        signature = self.get_stat_signature(file_path)
+        entry = self._entries.get(key)
+
+        if entry and entry[:3] == signature:
+            self.hits += 1
+            return entry[3], signature
+
+        self.misses += 1
+        return "", signature
+
+    def update(self, file_path, signature, hash_value):
+        """
+        Stores the hash value for a file, the signature should be read before the file was hashed so that a file that
+        changes while it is being read gets hashed again on the next run
+        """
+
+        key = str(file_path)
+        self._used_paths.add(key)
+        self._entries[key] = list(signature) + [hash_value]
+
+    def save(self):
+        """
+        Writes the index to disk, entries for files that were not looked up in this run are dropped
+        """
+
+        entries = {}
+        for each_path in self._used_paths:
+            if each_path in self._entries:
+                entries[each_path] = self._entries[each_path]
+
+        data = {
+            "version": HASH_INDEX_VERSION,
+            "algorithm": self.algorithm,
+            "stats": {"hits": self.hits, "misses": self.misses},
+            "files": entries
+        }
+
+        inspectionutilities.write_json_file(self.index_file_path, data)
+
+        L.info("Hash index: %s files reused, %s files hashed", self.hits, self.misses)
+
+
+def benchmark_hash_algorithms(list_of_files, worker_count=0):
+    """
+    Hashes the files with every available algorithm to compare the cost of each algorithm against how many distinct
+    values it produces for the same content
+    :return: dict of algorithm name -> results
+    """
+
+    # Warming up the file system cache so the first algorithm is not measured against a cold disk
+    ContentHashEngine(worker_count=worker_count).hash_files(list_of_files)
+
+    results = {}
+    for each_algorithm in sorted(HASH_ALGORITHMS):
+        engine = ContentHashEngine(worker_count=worker_count, algorithm=each_algorithm)
+        hash_values = engine.hash_files(list_of_files)
+
+        results[each_algorithm] = {
+            "digest_bits": HASH_ALGORITHMS[each_algorithm][1]().digest_size * 8,
+            "mb_per_second": engine.stats["mb_per_second"],
+            "files_per_second": engine.stats["files_per_second"],
+            "unique_hashes": len(set(hash_values.values()))
+        }
+
+    # Every algorithm sees the same content so any algorithm with fewer unique values had a collision
+    most_unique_hashes = max([each["unique_hashes"] for each in results.values()] + [0])
+    for each_result in results.values():
+        each_result["collisions"] = most_unique_hashes - each_result["unique_hashes"]
+
+    return results
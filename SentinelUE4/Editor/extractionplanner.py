@@ -0,0 +1,231 @@
+import heapq
+import logging
+import math
+import os
+import pathlib
+
+import ue4_constants
+from Editor import commandlets, inspectionutilities
+
+
+L = logging.getLogger(__name__)
+
+COST_HISTORY_FILE_NAME = "_extract_cost_history.json"
+COST_HISTORY_VERSION = 1
+
+# Used before any cost has been recorded, roughly what the editor spends loading a package
+DEFAULT_SECONDS_PER_MEGABYTE = 0.5
+DEFAULT_SECONDS_PER_FILE = 0.05
+
+# Time an editor needs to start up before it processes the first package
+DEFAULT_CHUNK_OVERHEAD_SECONDS = 20.0
+
+# More chunks than workers so that a chunk that was predicted badly doesn't leave the other workers idle
+DEFAULT_CHUNKS_PER_WORKER = 4
+
+# How much a new measurement moves the recorded cost of an asset
+COST_SMOOTHING = 0.5
+
+
+class ExtractCostHistory:
+    """
+    Remembers how long the package info commandlet took for every asset in earlier runs.  Only the duration of a
+    whole chunk is known so it is shared out between the assets of the chunk in proportion to their predicted cost
+    """
+
+    def __init__(self, history_file_path):
+
+        self.history_file_path = pathlib.Path(history_file_path)
+        self._costs = self._read_history()
+
+    def _read_history(self):
+        """
+        :return: dict of asset path -> seconds
+        """
+
+        data = inspectionutilities.read_json_file(self.history_file_path, "extract cost history")
+        if data is None or data.get("version") != COST_HISTORY_VERSION:
+            return {}
+
+        return data.get("assets", {})
+
+    def _get_seconds_per_byte(self, file_sizes):
+        """
+        Works out the seconds per byte from the assets that have a recorded cost
+        :param file_sizes: dict of asset path -> size
+        """
+
+        recorded_seconds = 0.0
+        recorded_bytes = 0
+        for each_path, each_size in file_sizes.items():
+            if each_path in self._costs:
+                recorded_seconds += self._costs[each_path]
+                recorded_bytes += each_size
+
+        if recorded_bytes:
+            return recorded_seconds / recorded_bytes
+
+        return DEFAULT_SECONDS_PER_MEGABYTE / (1024 * 1024)
+
+    def predict_costs(self, list_of_files):
+        """
+        Predicts how long each file takes to extract, files without a recorded cost are estimated from their size
+        :return: dict of asset path -> seconds
+        """
+
+        file_sizes = {}
+        for each_file in list_of_files:
+            try:
+                file_sizes[str(each_file)] = os.path.getsize(each_file)
+            except OSError:
+                file_sizes[str(each_file)] = 0
+
+        seconds_per_byte = self._get_seconds_per_byte(file_sizes)
+
+        costs = {}
+        for each_path, each_size in file_sizes.items():
+            if each_path in self._costs:
+                costs[each_path] = self._costs[each_path]
+            else:
+                costs[each_path] = DEFAULT_SECONDS_PER_FILE + each_size * seconds_per_byte
+
+        return costs
+
+    def record_chunk(self, list_of_files, elapsed_seconds, overhead_seconds=DEFAULT_CHUNK_OVERHEAD_SECONDS):
+        """
+        Shares the time a chunk took out between its files
+        """
+
+        if not list_of_files:
+            return
+
+        predicted_costs = self.predict_costs(list_of_files)
+        predicted_total = sum(predicted_costs.values()) or 1.0
+        package_seconds = max(0.0, elapsed_seconds - overhead_seconds)
+
+        for each_path, predicted_cost in predicted_costs.items():
+            measured_cost = package_seconds * predicted_cost / predicted_total
+
+            if each_path in self._costs:
+                measured_cost = self._costs[each_path] * (1 - COST_SMOOTHING) + measured_cost * COST_SMOOTHING
+
+            self._costs[each_path] = measured_cost
+
+    def save(self):
+        inspectionutilities.write_json_file(self.history_file_path,
+                                            {"version": COST_HISTORY_VERSION, "assets": self._costs})
+
+
+def get_cost_history(run_config):
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+    return ExtractCostHistory(cache_path.joinpath(COST_HISTORY_FILE_NAME))
+
+
+def plan_chunks(list_of_files, predicted_costs, chunk_count, max_arguments_length=0):
+    """
+    Splits the files into chunks with roughly the same predicted duration.  The most expensive files are placed
+    first, each into the chunk with the lowest predicted duration so far, and a chunk that would go over the command
+    line length gets a new chunk started next to it
+    :param predicted_costs: dict of asset path -> seconds
+    :param max_arguments_length: how many characters of file paths fit on the command line, 0 for no limit
+    :return: list of chunks, most expensive chunk first
+    """
+
+    if not list_of_files:
+        return []
+
+    chunk_count = max(1, min(chunk_count, len(list_of_files)))
+
+    # Heap of (predicted seconds, chunk number)
+    chunk_heap = [(0.0, i) for i in range(chunk_count)]
+    chunks = [[] for i in range(chunk_count)]
+    chunk_costs = [0.0] * chunk_count
+    chunk_lengths = [0] * chunk_count
+
+    ordered_files = sorted(list_of_files, key=lambda each_file: predicted_costs.get(str(each_file), 0.0),
+                           reverse=True)
+
+    for each_file in ordered_files:
+        cost = predicted_costs.get(str(each_file), 0.0)
+        argument_length = len(str(each_file)) + 1
+
+        # Chunks that are too long for another path are dropped from the heap, they can't take any more files
+        while chunk_heap:
+            chunk_cost, chunk_number = heapq.heappop(chunk_heap)
+            if not max_arguments_length or chunk_lengths[chunk_number] + argument_length <= max_arguments_length:
+                break
+        else:
+            chunk_number = len(chunks)
+            chunks.append([])
+            chunk_costs.append(0.0)
+            chunk_lengths.append(0)
+
+        chunks[chunk_number].append(each_file)
+        chunk_costs[chunk_number] += cost
+        chunk_lengths[chunk_number] += argument_length
+        heapq.heappush(chunk_heap, (chunk_costs[chunk_number], chunk_number))
+
+    planned_chunks = [(chunk_costs[i], chunks[i]) for i in range(len(chunks)) if chunks[i]]
+    planned_chunks.sort(key=lambda entry: entry[0], reverse=True)
+
+    if planned_chunks:
+        L.info("Planned %s chunks, predicted duration between %.1fs and %.1fs", len(planned_chunks),
+               planned_chunks[-1][0], planned_chunks[0][0])
+
+    return [each_chunk for cost, each_chunk in planned_chunks]
+
+
+def get_max_arguments_length(run_config, base_command_length, supports_response_file):
+    """
+    Works out how many characters of file paths fit in a chunk.  The engine cuts its command line off at its own limit
+    even when the files are passed in a response file, so that limit applies however the files are passed
+    :param base_command_length: length of the commandlet command without any files
+    :param supports_response_file: True if the files can be passed in a response file to get past the os limit
+    :return: number of characters, 0 for no limit
+    """
+
+    limits = [commandlets.get_engine_command_line_limit(run_config)]
+    if not supports_response_file:
+        limits.append(commandlets.get_command_line_limit(run_config))
+
+    limits = [each_limit for each_limit in limits if each_limit]
+    if not limits:
+        return 0
+
+    return max(1, min(limits) - base_command_length)
+
+
+def plan_extract_chunks(run_config, list_of_files, worker_count, base_command_length, cost_history=None,
+                        supports_response_file=False):
+    """
+    Plans the package info chunks from the cost history and the command line limits in the settings
+    :param base_command_length: length of the commandlet command without any files
+    :param supports_response_file: True if the files can be passed in a response file to get past the os limit
+    :return: list of chunks
+    """
+
+    if not list_of_files:
+        return []
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    overhead_seconds = settings.get(ue4_constants.EXTRACT_CHUNK_OVERHEAD_SECONDS, DEFAULT_CHUNK_OVERHEAD_SECONDS)
+    chunks_per_worker = settings.get(ue4_constants.EXTRACT_CHUNKS_PER_WORKER, DEFAULT_CHUNKS_PER_WORKER)
+    max_arguments_length = get_max_arguments_length(run_config, base_command_length, supports_response_file)
+
+    if not cost_history:
+        cost_history = get_cost_history(run_config)
+    predicted_costs = cost_history.predict_costs(list_of_files)
+
+    # Enough chunks to keep every worker busy, and at least as many as the command line length needs
+    total_arguments_length = sum(len(str(each_file)) + 1 for each_file in list_of_files)
+    chunk_count = max(1, worker_count * chunks_per_worker)
+
+    # Every chunk starts an editor, not worth it for less work than the start up takes unless workers are idle
+    if overhead_seconds:
+        chunk_count = min(chunk_count, max(worker_count, math.ceil(sum(predicted_costs.values()) / overhead_seconds)))
+
+    if max_arguments_length:
+        chunk_count = max(chunk_count, math.ceil(total_arguments_length / max_arguments_length))
+
+    return plan_chunks(list_of_files, predicted_costs, chunk_count, max_arguments_length)
@@ -0,0 +1,105 @@
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import threading
+
+import ue4_constants
+
+L = logging.getLogger(__name__)
+
+# Shortest elapsed time used when working out a rate, a run that finished within the timer resolution still reports
+MIN_ELAPSED_SECONDS = 1e-9
+
+
+def get_inspection_settings(run_config):
+    """
+    :return: dict of the package inspection settings in the run config, empty if none are configured
+    """
+
+    return run_config.get(ue4_constants.PACKAGE_INSPECTION_SETTINGS, {})
+
+
+def get_worker_count(configured_count):
+    """
+    :param configured_count: number of workers from the settings, 0 or less means one worker per core
+    :return: number of workers
+    """
+
+    if configured_count <= 0:
+        return os.cpu_count() or 1
+
+    return configured_count
+
+
+def get_throughput(elapsed_seconds, **counts):
+    """
+    Works out how many of each thing were processed per second
+    :param counts: name -> count, for example files=100 is reported as files_per_second
+    :return: dict with the seconds and the rate of each count
+    """
+
+    elapsed_seconds = max(elapsed_seconds, MIN_ELAPSED_SECONDS)
+
+    throughput = {"seconds": elapsed_seconds}
+    for each_name, each_count in counts.items():
+        throughput[each_name + "_per_second"] = each_count / elapsed_seconds
+
+    return throughput
+
+
+@contextlib.contextmanager
+def open_for_replace(path, temp_path=None):
+    """
+    Opens a temp file next to the path for writing and moves it into place once it is complete, an interrupted write
+    never leaves a half written file behind
+    :param temp_path: file to write to before it is moved into place, by default a name unique to the process and
+                      thread so that writers sharing a folder never write to the same temp file
+    """
+
+    path = pathlib.Path(path)
+    if temp_path is None:
+        temp_path = path.with_name("{}.{}.{}.tmp".format(path.name, os.getpid(), threading.get_ident()))
+
+    if not path.parent.exists():
+        os.makedirs(path.parent, exist_ok=True)
+
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            yield f
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_json_file(path, data, indent=None, temp_path=None):
+    """
+    Writes the data as json, see open_for_replace
+    """
+
+    with open_for_replace(path, temp_path) as f:
+        json.dump(data, f, indent=indent)
+
+
+def read_json_file(path, description):
+    """
+    Reads a json file that is recreated if it can't be used
+    :param description: what the file is, used in the warning if the file can't be read
+    :return: the data from the file, None if the file doesn't exist or can't be read
+    """
+
+    path = pathlib.Path(path)
+    if not path.exists():
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        L.warning("Unable to read the %s at: %s, starting a new one", description, path)
+        return None
@@ -1,32 +1,69 @@
-import hashlib
+import concurrent.futures
 import io
 import json
 import logging
+import mmap
 import os
 import pathlib
-import shutil
 import subprocess
+import sys
+import threading
+import time
 
 import ue4_constants
 import Editor.LogProcesser.packageinfolog as PackageInfoLog
-from Editor import commandlets, editorutilities
+from Editor.LogProcesser import logfiles
+from Editor import commandlets, commandletscheduler, contenthashing, editorutilities, extractionplanner, \
+    inspectionutilities, remotecache, sentinelcache
 
 
 L = logging.getLogger(__name__)
 
+# Markers of the package info output, used to split raw logs without decoding them
+PACKAGE_SUMMARY_START = b"Package '"
+PACKAGE_SUMMARY_END = b"' Summary"
+PACKAGE_FILENAME_MARKER = b"Filename: "
+
+DUPLICATE_CONTENT_REPORT_FILE_NAME = "duplicate_content_report.json"
+EXTRACTION_JOURNAL_FILE_NAME = "_extraction_journal.jsonl"
+BAD_PACKAGE_REPORT_FILE_NAME = "bad_package_report.json"
+CONVERSION_ERROR_REPORT_FILE_NAME = "conversion_error_report.json"
+
+DEFAULT_CONVERT_BATCH_SIZE = 200
+
+# Below this many chunks a run is too small to tell a systemic failure from a few bad packages by the failure rate
+MIN_CHUNKS_FOR_FAILURE_RATE = 4
+
+# Failed chunks are split this many times before every part of a chunk failing is taken as a systemic failure
+SYSTEMIC_FAILURE_DEPTH = 2
+
 
 class ProjectHashMap:
     """
     Takes in a list of files and generates a unique has value from them
     """
 
-    def __init__(self, list_of_files):
+    def __init__(self, list_of_files, hash_index=None, hash_engine=None):
 
         self.list_of_files = list_of_files
 
+        # Optional contenthashing.FileHashIndex that lets unchanged files reuse the hash from the last run
+        self.hash_index = hash_index
+
+        if not hash_engine:
+            hash_engine = contenthashing.ContentHashEngine()
+        self.hash_engine = hash_engine
+
+        # Maps each hash value to the first file that has that content, only one file per content needs extracting
         self.hash_value_mapping = {}
         self.hash_values_in_project = []
 
+        # Maps each hash value to every file that has that content, duplicated assets share a hash value
+        self.hash_paths_mapping = {}
+
+        # Reverse of the hash value mapping so that looking up the hash of a file does not need to scan every entry
+        self.file_hash_mapping = {}
+
         self._generate_hash_for_files()
 
     @staticmethod
@@ -36,12 +73,7 @@ class ProjectHashMap:
         :return:
         """
 
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-
-        return hash_md5.hexdigest()
+        return contenthashing.get_file_hash(file_path)
 
     def _generate_hash_for_files(self):
         """
@@ -49,29 +81,86 @@ class ProjectHashMap:
         :return:
         """
 
-        for i, each_file in enumerate(self.list_of_files):
-            file_hash_value = self._get_file_hash(each_file)
+        file_hash_values = {}
+        signatures = {}
+        files_to_hash = []
+
+        # Recovering the hash values of files that have not changed since the last run
+        for each_file in self.list_of_files:
+            if self.hash_index:
+                file_hash_value, signatures[each_file] = self.hash_index.lookup(each_file)
+                if file_hash_value:
+                    file_hash_values[each_file] = file_hash_value
+                    continue
+
+            files_to_hash.append(each_file)
+
+        L.info("Generating Hash for %s out of %s files", len(files_to_hash), len(self.list_of_files))
+
+        for each_file, file_hash_value in self.hash_engine.hash_files(files_to_hash).items():
+            file_hash_values[each_file] = file_hash_value
+
+            if self.hash_index:
+                self.hash_index.update(each_file, signatures[each_file], file_hash_value)
+
+        if self.hash_index:
+            self.hash_index.save()
+
+        for each_file in self.list_of_files:
+            file_hash_value = file_hash_values[each_file]
 
             # Making a simple list of hash values in the project
             self.hash_values_in_project.append(file_hash_value)
 
             # Creating a mapping with the hash value and the file path
-            self.hash_value_mapping[file_hash_value] = each_file
+            if file_hash_value not in self.hash_value_mapping:
+                self.hash_value_mapping[file_hash_value] = each_file
+                self.hash_paths_mapping[file_hash_value] = []
 
-            if i % 500 == 0:
-                L.info("Generating Hash for %s out of %s", str(i), str(len(self.list_of_files)))
+            self.hash_paths_mapping[file_hash_value].append(each_file)
+            self.file_hash_mapping[str(each_file)] = file_hash_value
 
     def get_hash_from_filename(self, filename):
 
-        for each_hash in self.hash_value_mapping:
-
-            if str(self.hash_value_mapping[each_hash]) == filename:
-                return each_hash
+        if str(filename) in self.file_hash_mapping:
+            return self.file_hash_mapping[str(filename)]
 
         L.warning("Unable to find hash from filename!")
 
         return ""
 
+    def get_filenames_from_hash(self, hash_value):
+        """
+        :return: every file in the project that has the content of the hash value
+        """
+
+        return self.hash_paths_mapping.get(hash_value, [])
+
+    def get_duplicate_content_report(self):
+        """
+        Reports the files that have the same content as another file in the project
+        :return: dict
+        """
+
+        duplicates = {}
+        duplicate_bytes = 0
+        for each_hash, each_paths in self.hash_paths_mapping.items():
+            if len(each_paths) > 1:
+                duplicates[each_hash] = [str(each_path) for each_path in each_paths]
+
+                # Every copy after the first one is content that does not need to be extracted
+                duplicate_bytes += os.path.getsize(each_paths[0]) * (len(each_paths) - 1)
+
+        duplicate_files = len(self.list_of_files) - len(self.hash_paths_mapping)
+
+        return {
+            "total_files": len(self.list_of_files),
+            "unique_content": len(self.hash_paths_mapping),
+            "duplicate_files": duplicate_files,
+            "duplicate_bytes": duplicate_bytes,
+            "duplicates": duplicates
+        }
+
     def get_filename_from_hash(self, hash_value):
 
         if hash_value in self.hash_value_mapping.keys():
@@ -87,18 +176,30 @@ class ExtractedDataArchive:
     Handles interacting with the archive both recovering data from there as well as updating it with new data
     """
 
-    def __init__(self, path_to_archive, file_hash_mappings):
+    def __init__(self, path_to_archive, file_hash_mappings, remote_cache=None, manifest=None, access_log=None):
         self.archive_folder_path = pathlib.Path(path_to_archive)
         self.project_hash_file_mappings = file_hash_mappings
 
+        # Shared cache that is checked for the entries that are not in the local archive
+        self.remote_cache = remote_cache
+        self._manifest = manifest or sentinelcache.CacheManifest(self.archive_folder_path)
+        self._access_log = access_log or sentinelcache.CacheAccessLog(self.archive_folder_path)
+        self._packs = sentinelcache.CachePacks(self.archive_folder_path)
+
         self._hash_values_in_archive = self._get_hash_values_from_archive()
         self.missing_files = []
         self.archived_files = []
 
     def get_missing_files(self):
         """
+        :return: list of the files whose hash value is not in the local archive, the remote cache or a pack
         """
 
+        self._remove_lost_entries()
+
+        if self.remote_cache:
+            self._fetch_missing_from_remote_cache()
+
         for each_hash in self.project_hash_file_mappings:
 
             if not self.is_hash_value_in_archive(each_hash):
@@ -107,15 +208,75 @@ class ExtractedDataArchive:
 
         return self.missing_files
 
+    def _remove_lost_entries(self):
+        """
+        Drops the manifest entries of the project whose file was deleted from the cache, so that they are fetched or
+        extracted again instead of failing to be recovered on every run
+        """
+
+        lost_hash_values = [each_hash for each_hash in self.project_hash_file_mappings
+                            if each_hash in self._hash_values_in_archive
+                            and not self._manifest.get_entry_path(each_hash).exists()]
+
+        if lost_hash_values:
+            L.warning("%s cache entries are in the manifest but their file is missing, extracting them again",
+                      len(lost_hash_values))
+            self._manifest.remove(lost_hash_values)
+
+    def _fetch_missing_from_remote_cache(self):
+        """
+        Recovers the entries that are missing locally from the remote cache and adds them to the local archive
+        """
+
+        missing_hash_values = [each_hash for each_hash in self.project_hash_file_mappings
+                               if not self.is_hash_value_in_archive(each_hash)]
+
+        if missing_hash_values:
+            self.remote_cache.fetch_entries(missing_hash_values, self._manifest)
+
     def get_archived_files(self):
 
+        used_hash_values = []
         for each_hash in self.project_hash_file_mappings:
-            if self.is_hash_value_in_archive(each_hash):
-                hash_file_path = self.archive_folder_path.joinpath(each_hash + ".log")
+            # Packed entries are recovered with extract_packed_files
+            if each_hash in self._hash_values_in_archive:
+                hash_file_path = self._manifest.get_entry_path(each_hash)
                 self.archived_files.append(hash_file_path)
+                used_hash_values.append(each_hash)
+
+        # Recording the hits so the cache garbage collection keeps the entries that are still in use
+        self._access_log.touch(used_hash_values)
+        self._access_log.save()
 
         return self.archived_files
 
+    def extract_packed_files(self, target_folder):
+        """
+        Writes the entries that only exist in a pack out to the target folder
+        :return: list of the extracted files
+        """
+
+        if not target_folder.exists():
+            os.makedirs(target_folder)
+
+        extracted_files = []
+        used_hash_values = []
+        for each_hash in self.project_hash_file_mappings:
+            if each_hash not in self._hash_values_in_archive and each_hash in self._packs:
+                extracted_file = self._packs.extract_entry(each_hash, target_folder)
+                remove_other_compression_logs(extracted_file)
+                extracted_files.append(extracted_file)
+                used_hash_values.append(each_hash)
+
+        self._packs.close()
+
+        self._access_log.touch(used_hash_values)
+        self._access_log.save()
+
+        self.archived_files.extend(extracted_files)
+
+        return extracted_files
+
     def is_hash_value_in_archive(self, value):
         """
         Check if a hash value exists in the archive
@@ -123,30 +284,81 @@ class ExtractedDataArchive:
         :return:
         """
 
-        if value in self._hash_values_in_archive:
+        if value in self._hash_values_in_archive or value in self._packs:
             return True
         else:
             return False
 
     def _get_hash_values_from_archive(self):
         """
-        search through the archive to look for folder names with hash values
-        :return:
+        Reads the hash values in the archive from the cache manifest
+        :return: set of hash values
         """
 
-        # TODO make it so that this can be somewhat cached but make sure that we can refresh if we know
-        # That the contents of the folder has changed
+        return self._manifest.get_hash_values()
+
+
+class ExtractionJournal:
+    """
+    Records the chunks of an extraction as they finish so that an interrupted run can continue where it stopped.
+    Every finished chunk is appended as its own line, a line that was cut off by a crash is ignored
+    """
+
+    def __init__(self, journal_file_path):
+
+        self.journal_file_path = pathlib.Path(journal_file_path)
+        self.completed_hash_values = set()
+        self.completed_chunks = 0
 
-        hash_values = []
-        for each_file in self.archive_folder_path.glob("*"):
-            each_file: pathlib.Path = each_file
+        self._read_journal()
 
-            name_split = each_file.name.split(".")
-            name_split.pop(-1)
-            hash_value = "".join(name_split)
-            hash_values.append(hash_value)
+    def _read_journal(self):
 
-        return hash_values
+        if not self.journal_file_path.exists():
+            return
+
+        each_line = "\n"
+        with open(self.journal_file_path, "r", encoding="utf-8") as f:
+            for each_line in f:
+                try:
+                    entry = json.loads(each_line)
+                except ValueError:
+                    L.warning("Ignoring incomplete entry in the extraction journal")
+                    continue
+
+                self.completed_hash_values.update(entry["hash_values"])
+                self.completed_chunks += 1
+
+        # Ending the cut off line so the next entry starts on a line of its own
+        if not each_line.endswith("\n"):
+            with open(self.journal_file_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def __contains__(self, hash_value):
+        return hash_value in self.completed_hash_values
+
+    def record_chunk(self, hash_values, elapsed_seconds=0.0):
+        """
+        Adds a finished chunk to the journal, the entry is flushed to disk before returning
+        """
+
+        entry = {"hash_values": list(hash_values), "seconds": elapsed_seconds}
+
+        with open(self.journal_file_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.completed_hash_values.update(entry["hash_values"])
+        self.completed_chunks += 1
+
+    def finish(self):
+        """
+        The extraction completed, the next run starts from the beginning
+        """
+
+        if self.journal_file_path.exists():
+            os.remove(self.journal_file_path)
 
 
 class BasePackageInspection:
@@ -164,6 +376,9 @@ class BasePackageInspection:
         # Files that have been extracted
         self.extracted_files = []
 
+        # Hash mapping of the project files, created when the inspection runs
+        self.hash_mapping = None
+
     def _construct_paths(self):
         """Makes the paths for outputs inside of the root artifact folder"""
 
@@ -193,13 +408,22 @@ class BasePackageInspection:
         project_files = self._editor_util.get_all_content_files()
         L.info("UE project has: %s files total", len(project_files))
 
-        # hash mapping for the files in the project
-        hash_mapping = ProjectHashMap(project_files)
+        # hash mapping for the files in the project, kept around so the splitter can reuse it
+        self.hash_mapping = create_project_hash_map(self._run_config, project_files)
         L.info("Hash Mapping completed")
 
+        self._write_duplicate_content_report()
+
+        # The cache is opened once for the whole run, the chunks are archived through it as they finish
+        cache_manifest = sentinelcache.CacheManifest(self._archive_folder_path)
+        access_log = sentinelcache.CacheAccessLog(self._archive_folder_path)
+        remote_cache = remotecache.get_remote_cache(self._run_config)
+        self._archiver = CacheArchiver(self._run_config, cache_manifest, access_log, remote_cache)
+
         # Compares the hash values with what has already been archived
         L.info("Searching archive")
-        archive_object = ExtractedDataArchive(self._archive_folder_path, hash_mapping.hash_value_mapping)
+        archive_object = ExtractedDataArchive(self._archive_folder_path, self.hash_mapping.hash_value_mapping,
+                                              remote_cache, cache_manifest, access_log)
 
         # Return a list of the missing files
         L.info("Generate missing files list")
@@ -211,17 +435,56 @@ class BasePackageInspection:
         L.info("Recover found files from archive")
         self._copy_archived_files_to_work_folder(archived_files)
 
+        L.info("Recover packed files from archive")
+        artifacts_path = pathlib.Path(self._run_config["environment"]["sentinel_artifacts_path"])
+        packed_files = archive_object.extract_packed_files(artifacts_path.joinpath("Raw", "Packages"))
+        L.info("Recovered %s files from packs", len(packed_files))
+
+        # Skipping what an earlier run that was interrupted already extracted
+        self._journal = ExtractionJournal(self._raw_data_dir.joinpath(EXTRACTION_JOURNAL_FILE_NAME))
+        if self._journal.completed_chunks:
+            missing_file_list = [each_file for each_file in missing_file_list
+                                 if self.hash_mapping.get_hash_from_filename(each_file) not in self._journal]
+            L.info("Resuming extraction, %s chunks were finished by an earlier run", self._journal.completed_chunks)
+
+        # Packages that made the editor fail are skipped until their content changes
+        self._bad_packages = sentinelcache.BadPackageList(self._archive_folder_path)
+        missing_file_list = [each_file for each_file in missing_file_list
+                             if self.hash_mapping.get_hash_from_filename(each_file) not in self._bad_packages]
+
         L.info("%s files need to be refresh", len(missing_file_list))
 
-        chunks_of_files_to_process = split_list_into_chunks(missing_file_list, 100)
+        chunks_of_files_to_process = self._plan_extract_chunks(missing_file_list)
 
         #  This is where we go through all the to be able to get information about paths and types
         L.info("Starting file extract")
         self._extract_from_files(chunks_of_files_to_process)
+        self._archiver.close()
+        self._write_bad_package_report()
+
+        # Packing once at the end instead of creating a pack per chunk
+        if sentinelcache.get_cache_storage(self._run_config) == sentinelcache.CACHE_STORAGE_PACK:
+            sentinelcache.pack_loose_entries(self._archive_folder_path,
+                                             [logfiles.get_log_hash_value(pathlib.Path(each_file))
+                                              for each_file in self.extracted_files])
+
+        self._journal.finish()
+
+    def _write_duplicate_content_report(self):
+        """Writes out which files share content, those files are only extracted once"""
+
+        report = self.hash_mapping.get_duplicate_content_report()
+
+        L.info("%s files have the same content as another file and are not extracted (%s bytes)",
+               report["duplicate_files"], report["duplicate_bytes"])
+
+        with open(self._processed_path.joinpath(DUPLICATE_CONTENT_REPORT_FILE_NAME), "w") as outfile:
+            json.dump(report, outfile, indent=4)
 
     def _copy_archived_files_to_work_folder(self, archived_files):
 
         artifacts_path = pathlib.Path(self._run_config["environment"]["sentinel_artifacts_path"])
+        materializer = sentinelcache.get_cache_materializer(self._run_config)
 
         for source_file in archived_files:
             source_file = pathlib.Path(source_file)
@@ -231,142 +494,424 @@ class BasePackageInspection:
                 if not target.parent.exists():
 
                     os.makedirs(target.parent)
-                shutil.copy(source_file, target)
+                remove_other_compression_logs(target)
+                materializer.materialize(source_file, target)
             else:
                 L.error("Attempting to copy a cached file that does not exist!")
                 L.error("File name: %s", source_file)
 
+        materializer.log_report("Recovered {} files from the archive".format(len(archived_files)))
+
+    def _plan_extract_chunks(self, missing_file_list):
+        """
+        Splits the files into chunks that are predicted to take about as long as each other
+        """
+
+        self._worker_count = commandletscheduler.get_worker_count(self._run_config)
+        self._cost_history = extractionplanner.get_cost_history(self._run_config)
+
+        # A response file gets the files past the os limit, the engine still cuts off its command line at its own
+        package_info_run_object = PackageInfoCommandlet(self._run_config, [])
+        base_command_length = len(package_info_run_object.get_command())
+
+        return extractionplanner.plan_extract_chunks(self._run_config, missing_file_list, self._worker_count,
+                                                     base_command_length, self._cost_history,
+                                                     package_info_run_object.supports_response_file())
+
+    def _write_bad_package_report(self):
+        """Writes out the packages in the project that the editor fails on, those packages have no asset info"""
+
+        bad_packages = self._bad_packages.get_entries(self.hash_mapping.hash_value_mapping)
+
+        for each_hash, each_entry in bad_packages.items():
+            L.error("Bad package: %s, the editor exited with: %s", each_entry["path"], each_entry["return_code"])
+
+        with open(self._processed_path.joinpath(BAD_PACKAGE_REPORT_FILE_NAME), "w") as outfile:
+            json.dump(bad_packages, outfile, indent=4)
+
+    def _bisect_failed_chunk(self, scheduler, failed_run_object):
+        """
+        Splits the packages of a chunk that made the editor fail in half and runs both halves again, until the package
+        that causes the failure is on its own.  A package on its own is run a second time before it is marked as bad.
+        The packages the editor finished before it failed are kept
+        """
+
+        # A crashed editor can leave the last package cut off, every package that was followed by another is complete
+        complete_output_files = failed_run_object.get_complete_output_files()
+        for each_file in failed_run_object.output_files[len(complete_output_files):]:
+            if each_file.exists():
+                os.remove(each_file)
+
+        if complete_output_files:
+            self._keep_extracted_files(complete_output_files)
+
+        self._check_for_systemic_failure(scheduler, failed_run_object)
+
+        files = failed_run_object.get_files_to_retry()
+        if len(files) == 1:
+            hash_value = self.hash_mapping.get_hash_from_filename(files[0])
+
+            # Confirming the failure so that a one off problem with the editor does not mark the package as bad
+            if hash_value not in self._retried_hashes:
+                self._retried_hashes.add(hash_value)
+                L.warning("Package failed with exit code: %s, trying it again: %s", failed_run_object.return_code,
+                          files[0])
+                self._schedule_chunk(scheduler, files)
+                return
+
+            self._bad_packages.add(hash_value, files[0], failed_run_object.return_code)
+            self._bad_packages.save()
+            return
+
+        L.warning("Chunk %s failed with exit code: %s, %s of its %s packages are missing, splitting %s packages to "
+                  "find the bad package", failed_run_object.chunk_index, failed_run_object.return_code,
+                  len(failed_run_object.get_missing_files()), len(failed_run_object.files), len(files))
+
+        # Keeping track of the halves and quarters of the chunks the run started with to spot systemic failures
+        top_level_chunk_index, depth = self._get_chunk_ancestry(failed_run_object.chunk_index)
+
+        middle = len(files) // 2
+        for each_half in (files[:middle], files[middle:]):
+            half_run_object = self._schedule_chunk(scheduler, each_half)
+
+            if top_level_chunk_index is not None and depth < SYSTEMIC_FAILURE_DEPTH:
+                self._chunk_ancestry[half_run_object.chunk_index] = (top_level_chunk_index, depth + 1)
+
+    def _get_chunk_ancestry(self, chunk_index):
+        """
+        :return: tuple of the index of the chunk the run started with that the chunk was split from and how many times
+        it was split, the index is None if it is not tracked
+        """
+
+        if chunk_index < self._top_level_chunk_count:
+            return chunk_index, 0
+
+        return self._chunk_ancestry.get(chunk_index, (None, 0))
+
+    def _keep_extracted_files(self, output_files, elapsed_seconds=0.0):
+        """
+        Archives the package logs of a chunk and marks their packages as done
+        """
+
+        self.extracted_files.extend(output_files)
+
+        # Archiving every chunk as soon as it is done so the work survives the run being interrupted
+        self._archiver.archive(output_files)
+        self._journal.record_chunk([logfiles.get_log_hash_value(each_file) for each_file in output_files],
+                                   elapsed_seconds)
+
+    def _schedule_chunk(self, scheduler, files):
+
+        run_object = PackageInfoCommandlet(self._run_config, files, self._chunk_count, self.hash_mapping)
+        self._chunk_count += 1
+        scheduler.schedule(run_object)
+
+        return run_object
+
+    def _check_for_systemic_failure(self, scheduler, failed_run_object):
+        """
+        Stops the run when the failures point at the editor or the machine instead of at some of the packages, so a
+        problem like a missing dll or license doesn't mark every package in the project as bad
+        """
+
+        reason = ""
+        top_level_chunk_index, depth = self._get_chunk_ancestry(failed_run_object.chunk_index)
+
+        if top_level_chunk_index is not None and depth == 0:
+            self._failed_top_level_chunks += 1
+
+            if self._top_level_chunk_count >= MIN_CHUNKS_FOR_FAILURE_RATE and \
+                    self._failed_top_level_chunks * 2 > self._top_level_chunk_count:
+                reason = "{} of {} chunks failed".format(self._failed_top_level_chunks, self._top_level_chunk_count)
+
+        # Two bad packages can fail both halves of a chunk, every quarter failing as well points at the editor
+        elif top_level_chunk_index is not None and depth == SYSTEMIC_FAILURE_DEPTH:
+            failed_count = self._failed_descendants.get(top_level_chunk_index, 0) + 1
+            self._failed_descendants[top_level_chunk_index] = failed_count
+
+            if failed_count == 2 ** SYSTEMIC_FAILURE_DEPTH:
+                reason = "every quarter of chunk {} failed".format(top_level_chunk_index)
+
+        if not reason:
+            return
+
+        scheduler.cancel()
+        L.error("Stopping the extraction, %s with exit code: %s. The editor fails on most packages, check the "
+                "editor log: %s", reason, failed_run_object.return_code, failed_run_object.log_file_name)
+        sys.exit(1)
+
     def _extract_from_files(self, chunks_of_files_to_process):
 
         # TODO deals the case where the user deletes files
+        package_info_run_objects = []
         for i, each_chunk in enumerate(chunks_of_files_to_process):
+            package_info_run_objects.append(PackageInfoCommandlet(self._run_config, each_chunk, i,
+                                                                  self.hash_mapping))
+
+        # Used to number the chunks that failed chunks are split into
+        self._chunk_count = len(package_info_run_objects)
+        self._top_level_chunk_count = len(package_info_run_objects)
+
+        # Used to tell a systemic failure from bad packages, chunk index of a part of a chunk the run started with ->
+        # tuple of the index of that chunk and how many times it was split
+        self._failed_top_level_chunks = 0
+        self._chunk_ancestry = {}
+        self._failed_descendants = {}
+        self._retried_hashes = set()
 
-            package_info_run_object = PackageInfoCommandlet(self._run_config, each_chunk)
+        scheduler = commandletscheduler.CommandletScheduler(self._worker_count)
+        settings = inspectionutilities.get_inspection_settings(self._run_config)
+        overhead_seconds = settings.get(ue4_constants.EXTRACT_CHUNK_OVERHEAD_SECONDS,
+                                        extractionplanner.DEFAULT_CHUNK_OVERHEAD_SECONDS)
 
-            L.info("Starting chunk %s out of %s ", i + 1, str(len(chunks_of_files_to_process)))
+        # Runs the extracts, the package logs are collected in the order the chunks finish
+        for package_info_run_object in scheduler.run(package_info_run_objects):
+            if package_info_run_object.has_failed():
+                self._bisect_failed_chunk(scheduler, package_info_run_object)
+                continue
 
-            # Runs the extract
-            package_info_run_object.run()
+            self._keep_extracted_files(package_info_run_object.output_files, package_info_run_object.elapsed_seconds)
 
-            # Save the file path
-            self.extracted_files.append(package_info_run_object.output_file)
+            # Remembering how long the assets took so the next run can plan its chunks better
+            self._cost_history.record_chunk(package_info_run_object.files, package_info_run_object.elapsed_seconds,
+                                            overhead_seconds)
+
+        self._cost_history.save()
 
 
 class PackageInfoCommandlet(commandlets.BaseUE4Commandlet):
     """ Runs the package info commandlet """
-    def __init__(self, run_config, unreal_asset_file_paths):
-        # Initializes the object
-        super().__init__(run_config, "_PkgInfoCommandlet", files=unreal_asset_file_paths)
+    def __init__(self, run_config, unreal_asset_file_paths, chunk_index=0, hash_mapping=None):
+        # Initializes the object, every chunk gets its own editor log so that chunks can run at the same time
+        super().__init__(run_config, "_PkgInfoCommandlet",
+                         log_file_name="_PkgInfoCommandlet_{}.log".format(chunk_index),
+                         files=unreal_asset_file_paths)
+
+        self.chunk_index = chunk_index
+        self.hash_mapping = hash_mapping
 
-        self.temp_extract_dir = pathlib.Path(self.environment_config["sentinel_artifacts_path"]).joinpath("temp")
-        self.output_file = ""
+        self.package_log_path = pathlib.Path(self.environment_config["sentinel_artifacts_path"]).joinpath("Raw",
+                                                                                                         "Packages")
+        self.output_files = []
+        self.return_code = None
 
     def run(self):
         """
-        Prepares and runs the Package info commandlet
-        :return: path to the log file
+        Runs the package info commandlet and splits its output into one log per package while it is running
+        :return: list of paths to the package logs
         """
 
         commandlet_command = self.get_command()
+        package_writer = PackageSummaryWriter(self.package_log_path, self.hash_mapping)
 
-        name = "_raw_package_info.log"
-        path = pathlib.Path(self.temp_extract_dir, "0" + name)
+        L.info("Writing packages to: %s", self.package_log_path)
 
-        if not os.path.exists(self.temp_extract_dir):
-            os.makedirs(self.temp_extract_dir)
+        popen = subprocess.Popen(commandlets.get_process_arguments(commandlet_command), stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT)
 
-        if path.exists():
-            number_of_files = len(os.listdir(self.temp_extract_dir))
-            path = pathlib.Path(self.temp_extract_dir, str(number_of_files) + name)
+        with io.TextIOWrapper(popen.stdout, encoding="utf-8", errors="ignore") as commandlet_output:
+            for line in commandlet_output:
+                package_writer.write_line(line)
 
-        L.info("Writing to: %s", path)
+        package_writer.close()
+        popen.wait()
 
-        with open(path, "w", encoding='utf-8', errors="ignore") as temp_out:
-            subprocess.run(commandlet_command, stdout=temp_out, stderr=subprocess.STDOUT)
+        self.return_code = popen.returncode
+        self.output_files = package_writer.output_files
 
-        self.output_file = path
+        if self.return_code != 0 and not self.has_failed():
+            L.warning("Chunk %s exited with: %s but every package was extracted", self.chunk_index, self.return_code)
 
+        return self.output_files
 
-class RawLogSplitter:
-    def __init__(self, run_config, log_files):
-        self._run_config = run_config
-        self._log_files_list = log_files
+    def get_missing_files(self):
+        """
+        :return: the files that the editor did not write a package summary for
+        """
 
-        self._editor_util = editorutilities.UE4EditorUtilities(run_config)
-        self.hash_mapping = ProjectHashMap(self._editor_util.get_all_content_files())
+        written_logs = set(each_file.name for each_file in self.output_files)
 
-        self.output_files = []
+        return [each_file for each_file in self.files
+                if self.hash_mapping.get_hash_from_filename(each_file) + sentinelcache.CACHE_ENTRY_EXTENSION
+                not in written_logs]
 
-    def _split_temp_log_into_raw_files(self, temp_log_path):
+    def get_complete_output_files(self):
+        """
+        The editor can stop in the middle of a package, a package log is only complete when another one followed it
+        :return: the package logs that are complete, all of them if the chunk did not fail
+        """
 
+        if not self.has_failed():
+            return list(self.output_files)
+
+        return self.output_files[:-1]
+
+    def get_files_to_retry(self):
         """
-        Split the temp file into smaller pieces in the raw folder
-        :param temp_log_path:
-        :return:
+        :return: the files without a complete package log, in the order of the chunk
+        """
+
+        complete_logs = set(each_file.name for each_file in self.get_complete_output_files())
+
+        return [each_file for each_file in self.files
+                if self.hash_mapping.get_hash_from_filename(each_file) + sentinelcache.CACHE_ENTRY_EXTENSION
+                not in complete_logs]
+
+    def has_failed(self):
+        """
+        The exit code alone does not say if the editor crashed, the commandlet also exits with an error when it
+        logged errors.  A chunk only failed when the output is incomplete
+        :return: True if the editor stopped before writing a package summary for every file
         """
 
-        out_log = None
+        return len(self.get_missing_files()) > 0
 
-        temp_file_path = pathlib.Path(self._run_config["environment"]["sentinel_artifacts_path"]).joinpath("_temp.log")
 
-        with io.open(temp_log_path, encoding='utf-8', errors="ignore") as infile:
+def is_start_of_package_summary(line):
+    """
+    :return: True if the line starts the summary of a new package in the package info output
+    """
+
+    return "Package '" in line and "' Summary" in line
 
-            for i, line in enumerate(infile):
-                if self._is_start_of_package_summary(line):
 
-                    if not out_log:
+class PackageSummaryWriter:
+    """
+    Splits package info output into one log per package as the lines come in.  The lines of a package are held back
+    until its filename is known, after that they are written straight to the log named after the hash of the package
+    """
 
-                        # If we have never saved anything open a new file
-                        out_log = io.open(temp_file_path, "w", encoding='utf-8', errors="ignore")
-                        # Adding the path to the log so we can move it to the archive folder when we finish
+    def __init__(self, output_folder, hash_mapping):
 
-                    else:
-                        # Closing the last file that was written into
-                        out_log.close()
-                        # Rename the file to the guid name
-                        self._move_temp_file(temp_file_path)
+        self.output_folder = pathlib.Path(output_folder)
+        self.hash_mapping = hash_mapping
+        self.output_files = []
 
-                        # Opening an new file with a new path
-                        out_log = open(temp_file_path, "w")
-                        # Adding the path to the log so we can move it to the archive folder when we finish
-                if out_log:
-                    # Write the data into the logs
-                    try:
-                        out_log.write(line + "")
-                    except UnicodeEncodeError:
-                        L.warning("Unable to process line" + str(i))
+        self._in_package = False
+        self._pending_lines = []
+        self._out_log = None
+        self._out_path = None
 
-        # Handles the last file
-        if out_log:
-            out_log.close()
-            self._move_temp_file(temp_file_path)
+        if not self.output_folder.exists():
+            os.makedirs(self.output_folder, exist_ok=True)
 
-    def _move_temp_file(self, temp_file):
+    def write_line(self, line):
+
+        if is_start_of_package_summary(line):
+            self._finish_package()
+            self._in_package = True
+
+        if not self._in_package:
+            return
+
+        if self._out_log:
+            self._out_log.write(line)
+            return
+
+        self._pending_lines.append(line)
+
+        if "Filename: " in line:
+            self._open_package_log(line)
+
+    def _open_package_log(self, filename_line):
 
         # absolute path to the file
-        asset_path = get_asset_path_from_log_file(temp_file)
-        hash = self.hash_mapping.get_hash_from_filename(asset_path)
+        asset_path = os.path.abspath(filename_line.split("Filename: ")[1].replace("\n", ""))
+        hash_value = self.hash_mapping.get_hash_from_filename(asset_path)
+
+        if not hash_value:
+            L.warning("Skipping package that is not part of the project: %s", asset_path)
+            self._in_package = False
+            self._pending_lines = []
+            return
+
+        self._out_path = self.output_folder.joinpath(hash_value + sentinelcache.CACHE_ENTRY_EXTENSION)
+
+        self._out_log = io.open(get_temp_output_path(self._out_path), "w", encoding='utf-8', errors="ignore")
+        self._out_log.writelines(self._pending_lines)
+        self._pending_lines = []
+
+    def _finish_package(self):
+
+        if self._out_log:
+            self._out_log.close()
+            os.replace(self._out_log.name, self._out_path)
+            self.output_files.append(self._out_path)
+            self._out_log = None
+        elif self._pending_lines:
+            L.error("Unable to find path from package summary")
+
+        self._in_package = False
+        self._pending_lines = []
+
+    def close(self):
+        self._finish_package()
+
+
+class RawLogSplitter:
+    """
+    Splits raw package info logs into one log per package, every raw log is split by its own worker process.
+
+    Only covers raw logs that are already on disk, output of a running commandlet is split as it streams in by the
+    PackageSummaryWriter and never goes through here
+    """
+
+    def __init__(self, run_config, log_files, hash_mapping=None):
+        self._run_config = run_config
+        self._log_files_list = log_files
+
+        # Reusing the hash mapping from the inspection instead of hashing the whole project a second time
+        if not hash_mapping:
+            editor_util = editorutilities.UE4EditorUtilities(run_config)
+            hash_mapping = create_project_hash_map(run_config, editor_util.get_all_content_files())
+
+        self.hash_mapping = hash_mapping
+
+        settings = inspectionutilities.get_inspection_settings(run_config)
+        self.worker_count = inspectionutilities.get_worker_count(settings.get(ue4_constants.SPLIT_WORKERS, 0))
+
+        self.output_files = []
+
+    def _get_output_folder(self):
 
         artifacts_path = pathlib.Path(self._run_config["environment"]["sentinel_artifacts_path"])
-        out_path = artifacts_path.joinpath("Raw", "Packages", hash + ".log")
+        return artifacts_path.joinpath("Raw", "Packages")
 
-        if not pathlib.Path(out_path.parent).exists():
-            os.makedirs(out_path.parent)
+    def _split_temp_log_into_raw_files(self, temp_log_path):
+        """
+        Split the temp file into smaller pieces in the raw folder
+        :return: list of the package logs that were written
+        """
 
-        shutil.move(temp_file, out_path)
-        self.output_files.append(out_path)
+        return split_raw_log(temp_log_path, self._get_output_folder(), self.hash_mapping)
 
     def run(self):
-        for each_log_file in self._log_files_list:
-            self._split_temp_log_into_raw_files(each_log_file)
 
-    @staticmethod
-    def _is_start_of_package_summary(line):
+        output_folder = self._get_output_folder()
+        worker_count = min(self.worker_count, len(self._log_files_list))
 
-        if "Package '" and "' Summary" in line:
-            return True
-        else:
-            return False
+        if worker_count <= 1:
+            split_results = map(self._split_temp_log_into_raw_files, self._log_files_list)
+            self._collect_output_files(split_results)
+            return
+
+        # The hash mapping is sent to each worker once instead of with every log
+        with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count, initializer=_init_split_worker,
+                                                    initargs=(output_folder, self.hash_mapping)) as executor:
+            split_results = executor.map(_split_raw_log_in_worker, self._log_files_list)
+            self._collect_output_files(split_results)
+
+    def _collect_output_files(self, split_results):
+        """
+        Adds the package logs in the order of the raw logs, a package that is in more than one raw log is listed once
+        """
+
+        known_files = set(self.output_files)
+        for each_output_files in split_results:
+            for each_file in each_output_files:
+                if each_file not in known_files:
+                    known_files.add(each_file)
+                    self.output_files.append(each_file)
 
     @staticmethod
     def _get_asset_name_from_summary_line(line):
@@ -387,24 +932,401 @@ class RawLogSplitter:
         return asset_name
 
 
-def convert_file_list_to_json(run_config):
-    """ Goes through a list of log files and converts them to json"""
+# Output folder and hash mapping of the split worker process, set once when the worker starts
+_split_worker_state = {}
+
+
+def _init_split_worker(output_folder, hash_mapping):
+
+    _split_worker_state["output_folder"] = output_folder
+    _split_worker_state["hash_mapping"] = hash_mapping
+
+
+def _split_raw_log_in_worker(log_path):
+
+    return split_raw_log(log_path, _split_worker_state["output_folder"], _split_worker_state["hash_mapping"])
+
+
+def get_temp_output_path(out_path):
+    """
+    Package logs are written next to their final path and moved into place once complete, the name is unique per
+    process and thread so that splitters writing the same package at the same time never share a file.  It leaves
+    out the log extension so a left over temp file is never picked up as a package log
+    :return: path
+    """
+
+    out_path = pathlib.Path(out_path)
+    return out_path.with_name("{}.{}.{}.tmp".format(logfiles.get_log_hash_value(out_path), os.getpid(),
+                                                     threading.get_ident()))
+
+
+def split_raw_log(log_path, output_folder, hash_mapping):
+    """
+    Splits a raw package info log into one log per package in the output folder
+    :return: list of the package logs that were written
+    """
+
+    # Compressed logs can't be memory mapped so they are decompressed and split line by line
+    if logfiles.is_compressed_log_file(log_path):
+        return split_log_lines(log_path, output_folder, hash_mapping)
+
+    return split_mapped_log(log_path, output_folder, hash_mapping)
+
+
+def split_log_lines(log_path, output_folder, hash_mapping):
+    """
+    Splits the log line by line with the same writer that splits the output of a running commandlet
+    :return: list of the package logs that were written
+    """
+
+    package_writer = PackageSummaryWriter(output_folder, hash_mapping)
+
+    with logfiles.open_log_file(log_path) as infile:
+        for line in infile:
+            package_writer.write_line(line)
+
+    package_writer.close()
+
+    return package_writer.output_files
+
+
+def split_mapped_log(log_path, output_folder, hash_mapping):
+    """
+    Splits the log in a single pass over the memory mapped bytes, each package is written out as a slice of the
+    log without being decoded
+    :return: list of the package logs that were written
+    """
+
+    output_folder = pathlib.Path(output_folder)
+    if not output_folder.exists():
+        os.makedirs(output_folder, exist_ok=True)
+
+    output_files = []
+    with open(log_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return output_files
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_log:
+            for start, end, filename in find_package_summaries(mapped_log):
+
+                if not filename:
+                    L.error("Unable to find path from package summary")
+                    continue
+
+                # absolute path to the file
+                asset_path = os.path.abspath(filename.decode("utf-8", errors="ignore"))
+                hash_value = hash_mapping.get_hash_from_filename(asset_path)
+
+                if not hash_value:
+                    L.warning("Skipping package that is not part of the project: %s", asset_path)
+                    continue
+
+                out_path = output_folder.joinpath(hash_value + sentinelcache.CACHE_ENTRY_EXTENSION)
+                temp_path = get_temp_output_path(out_path)
+                with open(temp_path, "wb") as out_log:
+                    out_log.write(mapped_log[start:end])
+                os.replace(temp_path, out_path)
+
+                output_files.append(out_path)
+
+    return output_files
+
+
+def find_package_summaries(data):
+    """
+    Finds the package summaries in raw package info output in a single pass, only the summary lines and the
+    filename are looked at
+    :param data: bytes like object, usually a memory mapped log
+    :return: generator of the start and end offset of each summary and the filename in it
+    """
+
+    summary_start = -1
+    summary_end = data.find(PACKAGE_SUMMARY_END)
+
+    while summary_end != -1:
+        line_start = data.rfind(b"\n", 0, summary_end) + 1
+
+        # Both markers have to be on the same line for it to be the start of a summary
+        if data.find(PACKAGE_SUMMARY_START, line_start, summary_end) != -1:
+            if summary_start != -1:
+                yield _get_package_summary(data, summary_start, line_start)
+            summary_start = line_start
+
+        summary_end = data.find(PACKAGE_SUMMARY_END, summary_end + len(PACKAGE_SUMMARY_END))
+
+    if summary_start != -1:
+        yield _get_package_summary(data, summary_start, len(data))
+
+
+def _get_package_summary(data, start, end):
+    """
+    :return: tuple of the start and end offset of the summary and its filename, the filename is empty if not found
+    """
+
+    filename = b""
+    filename_start = data.find(PACKAGE_FILENAME_MARKER, start, end)
+
+    if filename_start != -1:
+        filename_start += len(PACKAGE_FILENAME_MARKER)
+        filename_end = data.find(b"\n", filename_start, end)
+        if filename_end == -1:
+            filename_end = end
+        filename = data[filename_start:filename_end].rstrip(b"\r")
+
+    return start, end, filename
+
+
+def create_project_hash_map(run_config, list_of_files):
+    """
+    Creates the hash mapping for the files using the hash settings and the persistent hash index from the cache
+    :return: ProjectHashMap
+    """
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+
+    hash_engine = contenthashing.get_hash_engine(run_config)
+    hash_index = contenthashing.FileHashIndex(cache_path.joinpath(contenthashing.HASH_INDEX_FILE_NAME),
+                                              hash_engine.algorithm)
+
+    return ProjectHashMap(list_of_files, hash_index, hash_engine)
+
+
+def convert_file_list_to_json(run_config, hash_mapping=None):
+    """
+    Goes through a list of log files and converts them to json
+    :param hash_mapping: optional ProjectHashMap, used to add the other files that share the content of each log
+    :return: PackageLogConverter with the stats and the logs that failed to convert
+    """
+
+    converter = PackageLogConverter(run_config, hash_mapping)
+    converter.run()
+
+    return converter
+
+
+class PackageLogConverter:
+    """
+    Converts the package logs in Raw/Packages to json in Data/Packages.  The logs are converted in batches on a pool
+    of worker processes, a log that fails to convert is reported without stopping the rest of its batch
+
+    The logs are named after the content hash so their data only changes with the parser, a log is skipped when its
+    json is valid and was written by the current parser version
+    """
+
+    def __init__(self, run_config, hash_mapping=None):
+
+        self._run_config = run_config
+
+        # Optional ProjectHashMap, used to add the other files that share the content of each log
+        self.hash_mapping = hash_mapping
+
+        artifacts_path = pathlib.Path(run_config["environment"]["sentinel_artifacts_path"])
+        self.output_folder = artifacts_path.joinpath("Data", "Packages")
+        self.raw_folder = artifacts_path.joinpath("Raw", "Packages")
+
+        settings = inspectionutilities.get_inspection_settings(run_config)
+        self.worker_count = inspectionutilities.get_worker_count(settings.get(ue4_constants.CONVERT_WORKERS, 0))
+        self.batch_size = max(1, settings.get(ue4_constants.CONVERT_BATCH_SIZE, DEFAULT_CONVERT_BATCH_SIZE))
+
+        # Log path -> error message of the logs that failed to convert
+        self.failed_logs = {}
+
+        # Throughput of the last run
+        self.stats = {}
+
+    def _get_batches(self, log_paths):
+        """
+        :return: list of batches, each batch is a list of the log paths and the files that share their content
+        """
+
+        batches = []
+        for each_chunk in split_list_into_chunks(log_paths, self.batch_size):
+            files_by_hash = {}
+            if self.hash_mapping:
+                for each_log in each_chunk:
+                    hash_value = logfiles.get_log_hash_value(each_log)
+                    files_by_hash[hash_value] = self.hash_mapping.get_filenames_from_hash(hash_value)
+
+            batches.append((each_chunk, files_by_hash if self.hash_mapping else None))
+
+        return batches
+
+    def run(self):
+
+        if not self.output_folder.exists():
+            os.makedirs(self.output_folder)
+
+        start_time = time.perf_counter()
+
+        log_pattern = "*" + sentinelcache.CACHE_ENTRY_EXTENSION + "*"
+        log_paths = remove_duplicate_package_logs(sorted(self.raw_folder.glob(log_pattern)))
+        batches = self._get_batches(log_paths)
+        worker_count = min(self.worker_count, len(batches))
+
+        self.stats = {"converted": 0, "skipped": 0}
+        if worker_count <= 1:
+            for each_logs, each_files_by_hash in batches:
+                batch_result = convert_package_logs(each_logs, self.output_folder, each_files_by_hash)
+                self._collect_batch_result(batch_result, len(log_paths))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+                futures = [executor.submit(convert_package_logs, each_logs, self.output_folder, each_files_by_hash)
+                           for each_logs, each_files_by_hash in batches]
+
+                for future in concurrent.futures.as_completed(futures):
+                    self._collect_batch_result(future.result(), len(log_paths))
+
+        self._report_throughput(time.perf_counter() - start_time, worker_count)
+        self._write_error_report()
+
+    def _collect_batch_result(self, batch_result, total_count):
+
+        batch_converted_count, batch_skipped_count, batch_failed_logs = batch_result
+
+        for each_log, each_error in batch_failed_logs.items():
+            L.error("Unable to convert package log: %s, %s", each_log, each_error)
+        self.failed_logs.update(batch_failed_logs)
+
+        self.stats["converted"] += batch_converted_count
+        self.stats["skipped"] += batch_skipped_count
+
+        L.info("Converted %s out of %s package logs",
+               self.stats["converted"] + self.stats["skipped"] + len(self.failed_logs), total_count)
+
+    def _report_throughput(self, elapsed_seconds, worker_count):
+
+        converted_count = self.stats["converted"]
+
+        self.stats.update(inspectionutilities.get_throughput(elapsed_seconds, logs=converted_count))
+        self.stats.update({
+            "failed": len(self.failed_logs),
+            "workers": max(worker_count, 1),
+            "batch_size": self.batch_size
+        })
+
+        L.info("Converted %s package logs in %.2fs with %s workers: %.1f logs/s, %s up to date, %s failed",
+               converted_count, self.stats["seconds"], self.stats["workers"], self.stats["logs_per_second"],
+               self.stats["skipped"], len(self.failed_logs))
+
+    def _write_error_report(self):
+        """Writes out the package logs that could not be converted, those packages have no json data"""
+
+        with open(self.output_folder.parent.joinpath(CONVERSION_ERROR_REPORT_FILE_NAME), "w") as outfile:
+            json.dump(self.failed_logs, outfile, indent=4)
+
+
+def remove_other_compression_logs(log_path):
+    """
+    Removes the copies of a package log with another compression, they are left behind when the compression setting
+    changes between runs into the same folder
+    """
+
+    for each_path in logfiles.get_other_compression_paths(log_path):
+        if os.path.lexists(each_path):
+            os.remove(each_path)
+
+
+def remove_duplicate_package_logs(log_paths):
+    """
+    Keeps one package log per hash value, logs with the same hash value have the same content no matter how they are
+    compressed and would otherwise be converted more than once
+    :return: list of the log paths that are kept
+    """
+
+    kept_logs = {}
+    for each_log in log_paths:
+        hash_value = logfiles.get_log_hash_value(each_log)
+        if hash_value in kept_logs:
+            os.remove(each_log)
+            continue
+
+        kept_logs[hash_value] = each_log
+
+    removed_count = len(log_paths) - len(kept_logs)
+    if removed_count:
+        L.info("Removed %s package logs that were in the folder with more than one compression", removed_count)
+
+    return list(kept_logs.values())
+
+
+def convert_package_logs(log_paths, output_folder, files_by_hash=None):
+    """
+    Converts a batch of package logs to json, runs in the worker processes of the PackageLogConverter
+    :param files_by_hash: optional dict of hash value -> the files that have that content
+    :return: number of converted logs, number of logs that were up to date, dict of log path -> error message of the
+    logs that failed to convert
+    """
+
+    converted_count = 0
+    skipped_count = 0
+    failed_logs = {}
+
+    for each_generated_log in log_paths:
+        name = logfiles.get_log_hash_value(each_generated_log)
+        path = pathlib.Path(output_folder).joinpath(name + ".json")
+
+        # Any error in one malformed log is reported, the rest of the batch is still converted
+        try:
+            data = read_converted_data(path)
+            is_up_to_date = data is not None
+
+            if not is_up_to_date:
+                data = PackageInfoLog.PkgLogObject(each_generated_log).get_data()
+                data[PackageInfoLog.PARSER_VERSION_KEY] = PackageInfoLog.PARSER_VERSION
+
+            # The files that share the content come from the project so they can change without the content changing
+            if files_by_hash is not None:
+                duplicate_paths = _get_duplicate_asset_paths(files_by_hash.get(name, []), data["AssetPath"])
+                if data.get("DuplicateAssetPaths") != duplicate_paths:
+                    data["DuplicateAssetPaths"] = duplicate_paths
+                    is_up_to_date = False
+
+            if is_up_to_date:
+                skipped_count += 1
+                continue
+
+            inspectionutilities.write_json_file(path, data, indent=4, temp_path=get_temp_output_path(path))
+
+        except Exception as e:
+            failed_logs[str(each_generated_log)] = "{}: {}".format(type(e).__name__, e)
+            continue
+
+        converted_count += 1
+
+    return converted_count, skipped_count, failed_logs
+
+
+def read_converted_data(json_path):
+    """
+    Reads the json of a package log if it is valid and was written by the current parser
+    :return: dict of the data, None if the package log has to be converted
+    """
+
+    try:
+        with open(json_path) as infile:
+            data = json.load(infile)
+    except (OSError, ValueError):
+        return None
 
-    path_root = pathlib.Path(run_config["environment"]["sentinel_artifacts_path"]).joinpath("Data", "Packages")
-    raw_root = pathlib.Path(run_config["environment"]["sentinel_artifacts_path"]).joinpath("Raw", "Packages")
+    if not isinstance(data, dict) or data.get(PackageInfoLog.PARSER_VERSION_KEY) != PackageInfoLog.PARSER_VERSION:
+        return None
 
-    if not path_root.exists():
-        os.makedirs(path_root)
+    return data
 
-    for each_generated_log in raw_root.glob("*/"):
-        log = PackageInfoLog.PkgLogObject(each_generated_log)
-        data = log.get_data()
-        name = pathlib.Path(each_generated_log.with_suffix("")).name
 
-        path = path_root.joinpath(name + ".json")
+def _get_duplicate_asset_paths(files_with_content, asset_path):
+    """
+    Fans the extracted data of a content hash out to the other files that have the same content
+    :return: list of relative asset paths, excluding the asset path the log was extracted from
+    """
+
+    duplicate_paths = []
+    for each_file in files_with_content:
+        relative_path = PackageInfoLog.get_relative_content_path(each_file)
+        if relative_path != asset_path:
+            duplicate_paths.append(relative_path)
 
-        with open(path, 'w') as outfile:
-            json.dump(data, outfile, indent=4)
+    return duplicate_paths
 
 
 def split_list_into_chunks(list_to_split, max_entries_per_list):
@@ -420,17 +1342,90 @@ def split_list_into_chunks(list_to_split, max_entries_per_list):
     return chunks
 
 
-def archive_list_of_files(run_config, list_of_files):
+def archive_list_of_files(run_config, list_of_files, should_pack=True):
+    """
+    Adds the package logs to the cache
+    :param should_pack: move the new entries into a pack when the cache stores packs, False leaves that to the caller
+    """
 
-    cache_path = pathlib.Path(run_config["environment"]["sentinel_cache_path"])
+    archiver = CacheArchiver(run_config)
+    archived_entry_paths = archiver.archive(list_of_files)
+    archiver.close()
 
-    for source_file in list_of_files:
-        source_file = pathlib.Path(source_file)
-        target_file = cache_path.joinpath(source_file.name)
-        shutil.copy(source_file, target_file)
+    # Moving the new entries into a pack once they have been shared as loose files
+    if should_pack and sentinelcache.get_cache_storage(run_config) == sentinelcache.CACHE_STORAGE_PACK:
+        sentinelcache.pack_loose_entries(archiver.cache_path, [logfiles.get_log_hash_value(each_path)
+                                                               for each_path in archived_entry_paths])
+
+
+class CacheArchiver:
+    """
+    Adds package logs to the cache.  The manifest, access log, materializer and remote cache are set up once and used
+    for every batch that is archived, the access log is only written when the archiver is closed
+    """
+
+    def __init__(self, run_config, manifest=None, access_log=None, remote_cache=None):
+
+        self.cache_path = pathlib.Path(run_config["environment"]["sentinel_cache_path"])
+
+        self.manifest = manifest or sentinelcache.CacheManifest(self.cache_path)
+        self.access_log = access_log or sentinelcache.CacheAccessLog(self.cache_path)
+
+        self.materializer = sentinelcache.get_cache_materializer(run_config, into_cache=True)
+        self.compression = sentinelcache.get_cache_compression(run_config)
+
+        # Sharing the new entries with the other agents
+        self.remote_cache = None
+        if remotecache.should_upload_to_remote_cache(run_config):
+            self.remote_cache = remote_cache or remotecache.get_remote_cache(run_config)
+
+        self.archived_count = 0
+
+    def archive(self, list_of_files):
+        """
+        :return: list of the paths of the new cache entries
+        """
+
+        archived_entry_names = []
+        archived_entry_paths = []
+        for source_file in list_of_files:
+            source_file = pathlib.Path(source_file)
+            hash_value = logfiles.get_log_hash_value(source_file)
+
+            extension = sentinelcache.CACHE_ENTRY_EXTENSION + logfiles.COMPRESSION_EXTENSIONS[self.compression]
+            target_file = sentinelcache.get_cache_entry_path(self.cache_path, hash_value, extension)
+
+            if not target_file.parent.exists():
+                os.makedirs(target_file.parent)
+
+            # Writing to a temp file first so that the cache never contains a half written entry
+            temp_file = sentinelcache.get_cache_entry_path(self.cache_path, hash_value, ".tmp")
+            if self.compression == logfiles.COMPRESSION_NONE or source_file.name.endswith(extension):
+                self.materializer.materialize(source_file, temp_file)
+            else:
+                logfiles.compress_log_file(source_file, temp_file, self.compression)
+            os.replace(temp_file, target_file)
+
+            archived_entry_names.append(target_file.name)
+            archived_entry_paths.append(target_file)
+
+        # Only adding the entries to the manifest once the files are in place
+        self.manifest.add(archived_entry_names)
+        self.access_log.touch([logfiles.get_log_hash_value(each_path) for each_path in archived_entry_paths])
+
+        if self.remote_cache:
+            self.remote_cache.upload_entries(archived_entry_paths)
+
+        self.archived_count += len(archived_entry_names)
+
+        return archived_entry_paths
+
+    def close(self):
+
+        self.access_log.save()
+        self.materializer.log_report("Archived {} files".format(self.archived_count))
 
 
-# TODO move this function to the LogParser package
 def get_asset_path_from_log_file(log_file_path):
 
     path = "Unknown"
@@ -439,7 +1434,7 @@ def get_asset_path_from_log_file(log_file_path):
         return path
 
     L.debug("Checking filename from log file: %s ", log_file_path)
-    with io.open(log_file_path, encoding='utf-8', errors="ignore") as infile:
+    with logfiles.open_log_file(log_file_path) as infile:
 
         for each in infile:
             if "Filename: " in each:
@@ -464,7 +1459,7 @@ def get_asset_type_from_log_file(log_file_path):
         L.warning("Unable to find logfile at path: %s", log_file_path)
         return asset_type
 
-    with io.open(log_file_path, encoding='utf-8', errors="ignore") as infile:
+    with logfiles.open_log_file(log_file_path) as infile:
 
         for i, each in enumerate(infile):
             if "Number of assets with Asset Registry data: " in each:
@@ -0,0 +1,510 @@
+import concurrent.futures
+import hmac
+import http.client
+import http.server
+import json
+import logging
+import os
+import pathlib
+import re
+import shutil
+import threading
+import urllib.request
+
+import ue4_constants
+from Editor import inspectionutilities, sentinelcache
+
+
+L = logging.getLogger(__name__)
+
+DEFAULT_REMOTE_WORKERS = 8
+
+# Seconds a request to the cache server may stall before it is given up on
+DEFAULT_REMOTE_TIMEOUT = 60
+
+DEFAULT_SERVER_HOST = "127.0.0.1"
+
+# Header that carries the upload token, the server refuses uploads without it when a token is configured
+TOKEN_HEADER = "X-Sentinel-Cache-Token"
+
+# Errors of a single transfer, a cut off response raises an http error that is not an OSError
+TRANSFER_ERRORS = (OSError, http.client.HTTPException)
+
+# Number of hash values sent in a single existence check
+EXISTS_BATCH_SIZE = 1000
+
+# Entry names that the cache server accepts, anything else could point outside of the cache folder
+VALID_ENTRY_NAME = re.compile(r"^[A-Za-z0-9-]+\.log(\.gz|\.zst)?$")
+
+
+def get_remote_cache(run_config):
+    """
+    Creates the shared cache from the package inspection settings, an http(s) url uses a cache server and anything
+    else is treated as a folder, for example on a network share
+    :return: remote cache object, None if no remote cache is configured
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    location = settings.get(ue4_constants.REMOTE_CACHE, "")
+
+    if not location:
+        return None
+
+    worker_count = settings.get(ue4_constants.REMOTE_CACHE_WORKERS, DEFAULT_REMOTE_WORKERS)
+
+    if location.startswith("http://") or location.startswith("https://"):
+        return HttpRemoteCache(location, worker_count,
+                               timeout=settings.get(ue4_constants.REMOTE_CACHE_TIMEOUT, DEFAULT_REMOTE_TIMEOUT),
+                               token=get_remote_cache_token(run_config))
+
+    return FileSystemRemoteCache(location, worker_count)
+
+
+def get_remote_cache_token(run_config):
+    """
+    :return: token that uploads to the cache server need, empty if uploads are not protected
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return settings.get(ue4_constants.REMOTE_CACHE_TOKEN, "")
+
+
+def should_upload_to_remote_cache(run_config):
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return settings.get(ue4_constants.REMOTE_CACHE_UPLOAD, True)
+
+
+class BaseRemoteCache:
+    """
+    Shared cache tier that is checked after the local cache.  Existence checks are done for many hash values at a
+    time and entries are transferred in parallel
+    """
+
+    def __init__(self, location, worker_count=DEFAULT_REMOTE_WORKERS):
+        self.location = location
+        self.worker_count = max(1, worker_count)
+
+    def get_existing_entries(self, hash_values):
+        """
+        Needs to be overwritten on child
+        :return: dict of hash value -> entry name for the hash values that are in the remote cache
+        """
+        raise NotImplementedError
+
+    def _download_entry(self, entry_name, target_path):
+        """
+        Needs to be overwritten on child
+        """
+        raise NotImplementedError
+
+    def _upload_entries(self, entry_paths):
+        """
+        Needs to be overwritten on child
+        :return: list of the entry names that were uploaded
+        """
+        raise NotImplementedError
+
+    def fetch_entries(self, hash_values, local_manifest):
+        """
+        Downloads the entries that exist in the remote cache into the local cache
+        :param local_manifest: sentinelcache.CacheManifest of the local cache, the fetched entries get added to it
+        :return: list of the hash values that were fetched
+        """
+
+        existing_entries = self.get_existing_entries(hash_values)
+        L.info("%s out of %s missing entries found in the remote cache: %s", len(existing_entries),
+               len(hash_values), self.location)
+
+        def download(entry):
+            hash_value, entry_name = entry
+            extension = sentinelcache.split_entry_name(entry_name)[1]
+            target_path = sentinelcache.get_cache_entry_path(local_manifest.cache_path, hash_value, extension)
+
+            if not target_path.parent.exists():
+                os.makedirs(target_path.parent, exist_ok=True)
+
+            temp_path = sentinelcache.get_cache_entry_path(local_manifest.cache_path, hash_value, ".tmp")
+            try:
+                self._download_entry(entry_name, temp_path)
+            except TRANSFER_ERRORS:
+                # A failed download must not leave a partial entry behind
+                if temp_path.exists():
+                    os.remove(temp_path)
+                raise
+
+            os.replace(temp_path, target_path)
+
+            return entry_name
+
+        fetched_entry_names = self._run_parallel(download, existing_entries.items())
+
+        local_manifest.add(fetched_entry_names)
+        L.info("Fetched %s entries from the remote cache", len(fetched_entry_names))
+
+        return [sentinelcache.split_entry_name(each_name)[0] for each_name in fetched_entry_names]
+
+    def upload_entries(self, entry_paths):
+        """
+        Uploads local cache entries that the remote cache does not have yet
+        :param entry_paths: paths to entries in the local cache
+        """
+
+        entry_paths = [pathlib.Path(each_path) for each_path in entry_paths]
+        existing_entries = self.get_existing_entries([sentinelcache.split_entry_name(each_path.name)[0]
+                                                      for each_path in entry_paths])
+
+        new_entry_paths = []
+        for each_path in entry_paths:
+            if sentinelcache.split_entry_name(each_path.name)[0] not in existing_entries:
+                new_entry_paths.append(each_path)
+
+        uploaded_entry_names = self._upload_entries(new_entry_paths)
+        L.info("Uploaded %s entries to the remote cache: %s", len(uploaded_entry_names), self.location)
+
+    def _run_parallel(self, function, items):
+        """
+        Runs the function on every item on the worker threads
+        :return: list of the results that did not fail
+        """
+
+        results = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.worker_count) as executor:
+            futures = [executor.submit(function, each_item) for each_item in items]
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results.append(future.result())
+                except TRANSFER_ERRORS as e:
+                    L.warning("Remote cache transfer failed: %s", e)
+
+        return results
+
+
+class FileSystemRemoteCache(BaseRemoteCache):
+    """
+    Remote cache that is a sentinel cache folder on another mount, usually a network share.  The manifest of the
+    shared folder is read once and kept up to date with the uploads of this run, entries that the shared folder
+    stores in packs are found through the pack indexes
+    """
+
+    def __init__(self, location, worker_count=DEFAULT_REMOTE_WORKERS):
+        super().__init__(location, worker_count)
+        self.cache_path = pathlib.Path(location)
+        self._manifest = sentinelcache.CacheManifest(self.cache_path, shared=True)
+
+        # hash value -> tuple of the pack path, offset and length of the entries that were found in a pack
+        self._packed_entries = {}
+
+    def get_existing_entries(self, hash_values):
+
+        entries = self._manifest.get_entries()
+
+        # The packs are only open for the lookup, downloads read the entries straight from the pack files
+        packs = sentinelcache.CachePacks(self.cache_path)
+
+        existing_entries = {}
+        for each_hash in hash_values:
+            if each_hash in entries:
+                existing_entries[each_hash] = each_hash + entries[each_hash]
+                continue
+
+            packed_entry = packs.find(each_hash)
+            if packed_entry:
+                reader, (extension, offset, length) = packed_entry
+                existing_entries[each_hash] = each_hash + extension
+                self._packed_entries[each_hash] = (reader.pack_path, offset, length)
+
+        packs.close()
+
+        return existing_entries
+
+    def _get_remote_path(self, entry_name):
+
+        hash_value, extension = sentinelcache.split_entry_name(entry_name)
+        return sentinelcache.get_cache_entry_path(self.cache_path, hash_value, extension)
+
+    def _download_entry(self, entry_name, target_path):
+
+        hash_value = sentinelcache.split_entry_name(entry_name)[0]
+        if hash_value not in self._packed_entries:
+            shutil.copyfile(self._get_remote_path(entry_name), target_path)
+            return
+
+        pack_path, offset, length = self._packed_entries[hash_value]
+        with open(pack_path, "rb") as pack_file:
+            pack_file.seek(offset)
+            data = pack_file.read(length)
+
+        if len(data) != length:
+            raise OSError("Entry is cut off in pack: {}".format(pack_path))
+
+        with open(target_path, "wb") as f:
+            f.write(data)
+
+    def _upload_entries(self, entry_paths):
+
+        def upload(entry_path):
+            remote_path = self._get_remote_path(entry_path.name)
+            os.makedirs(remote_path.parent, exist_ok=True)
+
+            # Other agents can be writing the same entry, every upload gets its own temp file
+            hash_value = sentinelcache.split_entry_name(entry_path.name)[0]
+            temp_path = remote_path.with_name(hash_value + "." + str(os.getpid()) + ".tmp")
+            shutil.copyfile(entry_path, temp_path)
+            os.replace(temp_path, remote_path)
+
+            return entry_path.name
+
+        uploaded_entry_names = self._run_parallel(upload, entry_paths)
+        self._manifest.add(uploaded_entry_names)
+
+        return uploaded_entry_names
+
+
+class HttpRemoteCache(BaseRemoteCache):
+    """
+    Remote cache reached through a sentinel cache server, see serve_cache for the protocol
+    """
+
+    def __init__(self, location, worker_count=DEFAULT_REMOTE_WORKERS, timeout=DEFAULT_REMOTE_TIMEOUT, token=""):
+        super().__init__(location.rstrip("/"), worker_count)
+
+        # A cache server that stops responding fails the request instead of stalling the run
+        self.timeout = timeout
+        self.token = token
+
+    def get_existing_entries(self, hash_values):
+
+        hash_values = list(hash_values)
+
+        existing_entries = {}
+        for i in range(0, len(hash_values), EXISTS_BATCH_SIZE):
+            body = json.dumps({"hash_values": hash_values[i:i + EXISTS_BATCH_SIZE]}).encode("utf-8")
+            request = urllib.request.Request(self.location + "/exists", data=body, method="POST",
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    existing_entries.update(json.load(response)["entries"])
+            except (ValueError,) + TRANSFER_ERRORS as e:
+                L.warning("Unable to reach the remote cache: %s", e)
+                break
+
+        return existing_entries
+
+    def _download_entry(self, entry_name, target_path):
+
+        with urllib.request.urlopen(self.location + "/entries/" + entry_name, timeout=self.timeout) as response:
+            with open(target_path, "wb") as f:
+                shutil.copyfileobj(response, f)
+                received_bytes = f.tell()
+
+            # Reading in blocks does not raise on a connection that closed early, the length has to be checked
+            expected_bytes = response.headers.get("Content-Length")
+            if expected_bytes is not None and received_bytes != int(expected_bytes):
+                raise http.client.IncompleteRead(b"", int(expected_bytes) - received_bytes)
+
+    def _upload_entries(self, entry_paths):
+
+        def upload(entry_path):
+            headers = {"Content-Length": str(os.path.getsize(entry_path))}
+            if self.token:
+                headers[TOKEN_HEADER] = self.token
+
+            with open(entry_path, "rb") as f:
+                request = urllib.request.Request(self.location + "/entries/" + entry_path.name, data=f,
+                                                 method="PUT", headers=headers)
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+
+            return entry_path.name
+
+        return self._run_parallel(upload, entry_paths)
+
+
+class CacheRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves a sentinel cache folder
+
+    POST /exists          {"hash_values": [...]} -> {"entries": {hash value: entry name}}
+    GET  /entries/<name>  downloads an entry
+    PUT  /entries/<name>  uploads an entry, needs the upload token in the X-Sentinel-Cache-Token header when the
+                          server has one
+    """
+
+    manifest = None
+    manifest_lock = threading.Lock()
+    upload_token = ""
+
+    # Packs of the served cache, opened again when a pack is written or removed
+    packs = None
+    packs_mtime = None
+
+    @classmethod
+    def _find_packed_entry(cls, hash_value):
+        """
+        Needs to be called with the manifest lock held
+        :return: tuple of the extension and the data of the entry, None if no pack has the entry
+        """
+
+        pack_folder = cls.manifest.cache_path.joinpath(sentinelcache.PACK_FOLDER_NAME)
+        try:
+            packs_mtime = os.stat(pack_folder).st_mtime_ns
+        except FileNotFoundError:
+            packs_mtime = None
+
+        if cls.packs is None or packs_mtime != cls.packs_mtime:
+            if cls.packs:
+                cls.packs.close()
+
+            cls.packs = sentinelcache.CachePacks(cls.manifest.cache_path)
+            cls.packs_mtime = packs_mtime
+
+        packed_entry = cls.packs.find(hash_value)
+        if not packed_entry:
+            return None
+
+        reader, (extension, offset, length) = packed_entry
+        return extension, reader.read(offset, length)
+
+    def _get_entry_path(self):
+
+        entry_name = self.path[len("/entries/"):]
+        if not self.path.startswith("/entries/") or not VALID_ENTRY_NAME.match(entry_name):
+            self.send_error(400, "Invalid entry name")
+            return None, None
+
+        hash_value, extension = sentinelcache.split_entry_name(entry_name)
+        return entry_name, sentinelcache.get_cache_entry_path(self.manifest.cache_path, hash_value, extension)
+
+    def do_POST(self):
+
+        if self.path != "/exists":
+            self.send_error(404)
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        existing_entries = {}
+        with self.manifest_lock:
+            entries = self.manifest.get_entries()
+
+            for each_hash in request["hash_values"]:
+                if each_hash in entries:
+                    existing_entries[each_hash] = each_hash + entries[each_hash]
+                    continue
+
+                packed_entry = self._find_packed_entry(each_hash)
+                if packed_entry:
+                    existing_entries[each_hash] = each_hash + packed_entry[0]
+
+        body = json.dumps({"entries": existing_entries}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+
+        entry_name, entry_path = self._get_entry_path()
+        if not entry_path:
+            return
+
+        if entry_path.exists():
+            self.send_response(200)
+            self.send_header("Content-Length", str(os.path.getsize(entry_path)))
+            self.end_headers()
+            with open(entry_path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+            return
+
+        with self.manifest_lock:
+            packed_entry = self._find_packed_entry(sentinelcache.split_entry_name(entry_name)[0])
+
+        if not packed_entry:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(packed_entry[1])))
+        self.end_headers()
+        self.wfile.write(packed_entry[1])
+
+    def do_PUT(self):
+
+        if self.upload_token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), self.upload_token):
+            self.send_error(403, "Invalid upload token")
+            return
+
+        entry_name, entry_path = self._get_entry_path()
+        if not entry_path:
+            return
+
+        content_length = self.headers.get("Content-Length", "")
+        if not content_length.isdigit():
+            self.send_error(411, "Content-Length is needed")
+            return
+
+        os.makedirs(entry_path.parent, exist_ok=True)
+
+        temp_path = entry_path.with_name(entry_name.split(".")[0] + "." + str(threading.get_ident()) + ".tmp")
+        remaining_bytes = int(content_length)
+        with open(temp_path, "wb") as f:
+            while remaining_bytes > 0:
+                chunk = self.rfile.read(min(remaining_bytes, 1024 * 1024))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining_bytes -= len(chunk)
+
+        # The client went away before sending the whole entry, a partial entry would be served to every agent
+        if remaining_bytes != 0:
+            os.remove(temp_path)
+            self.send_error(400, "Entry is incomplete")
+            return
+
+        os.replace(temp_path, entry_path)
+
+        with self.manifest_lock:
+            self.manifest.add([entry_name])
+
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, message_format, *args):
+        L.debug(message_format, *args)
+
+
+def create_cache_server(cache_path, port, host=DEFAULT_SERVER_HOST, upload_token=""):
+    """
+    :return: server for the cache folder, not started yet
+    """
+
+    CacheRequestHandler.manifest = sentinelcache.CacheManifest(cache_path)
+    CacheRequestHandler.upload_token = upload_token
+    CacheRequestHandler.packs = None
+    CacheRequestHandler.packs_mtime = None
+
+    return http.server.ThreadingHTTPServer((host, port), CacheRequestHandler)
+
+
+def serve_cache(cache_path, port, host=DEFAULT_SERVER_HOST, upload_token=""):
+    """
+    Serves the cache folder so that other agents can use it as their remote cache.  Only the local machine can reach
+    it unless a host like 0.0.0.0 is given, uploads should be protected with a token when it is reachable
+    """
+
+    server = create_cache_server(cache_path, port, host, upload_token)
+
+    if not upload_token:
+        L.warning("The cache server accepts uploads from anyone that can reach: %s, set remote_cache_token to "
+                  "protect it", host)
+
+    L.info("Serving the sentinel cache: %s on: %s:%s", cache_path, host, port)
+    print("Serving the sentinel cache on: {}:{}".format(host, port))
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
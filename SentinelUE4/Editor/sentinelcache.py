@@ -0,0 +1,1028 @@
+import errno
+import hashlib
+import itertools
+import logging
+import mmap
+import os
+import pathlib
+import shutil
+import struct
+import tempfile
+import time
+
+import ue4_constants
+from Editor.LogProcesser import logfiles
+from Editor import inspectionutilities
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on windows, copy on write clones fall back to copying there
+    fcntl = None
+
+
+L = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = "_cache_manifest.txt"
+ACCESS_LOG_FILE_NAME = "_cache_access.json"
+BAD_PACKAGES_FILE_NAME = "_bad_packages.json"
+
+DEFAULT_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+
+# A packed cache over the budget is repacked down to this part of the budget, so that it is not rewritten again as
+# soon as the next run adds a few entries
+DEFAULT_REPACK_TARGET_RATIO = 0.8
+
+CACHE_STORAGE_LOOSE = "loose"
+CACHE_STORAGE_PACK = "pack"
+
+PACK_FOLDER_NAME = "packs"
+PACK_MAGIC = b"SNTLPACK"
+PACK_INDEX_MAGIC = b"SNTLIDX1"
+
+# Index header is the magic and the number of entries, each record is the hash value, extension, offset and length
+PACK_INDEX_HEADER = struct.Struct("<8sQ")
+PACK_INDEX_RECORD = struct.Struct("<64s16sQQ")
+PACK_INDEX_KEY_SIZE = 64
+
+# Packs written by the same process within the same millisecond, like a repack right after a pack, need their own name
+_pack_numbers = itertools.count()
+
+# Bumped when the way entries are laid out on disk changes, a manifest for another layout gets rebuilt
+CACHE_LAYOUT_VERSION = 3
+MANIFEST_HEADER = "#layout " + str(CACHE_LAYOUT_VERSION) + "\n"
+
+# The manifest is rewritten with only the live entries once it has more dead lines than this and than live entries
+MANIFEST_COMPACT_MIN_DEAD_LINES = 10000
+
+CACHE_ENTRY_EXTENSION = ".log"
+
+
+def split_entry_name(entry_name):
+    """
+    :return: tuple of the hash value and the extension of a cache entry file name
+    """
+
+    hash_value, _, extension = entry_name.partition(".")
+    return hash_value, "." + extension
+
+
+def get_cache_entry_path(cache_path, hash_value, extension=CACHE_ENTRY_EXTENSION):
+    """
+    Returns where an entry is stored in the cache.  Entries are spread over two levels of folders named after the
+    first characters of the digest (ab/cd/abcd....log) so that no folder ends up with too many files in it
+    :return: path to the entry
+    """
+
+    # Algorithm prefixes are skipped so that the folders are spread over the digest and not the prefix
+    digest = hash_value.split("-")[-1]
+
+    return pathlib.Path(cache_path).joinpath(digest[0:2], digest[2:4], hash_value + extension)
+
+
+# ioctl request that clones the extents of one file into another on btrfs, xfs and other copy on write file systems
+FICLONE = 0x40049409
+
+MATERIALIZE_HARDLINK = "hardlink"
+MATERIALIZE_REFLINK = "reflink"
+MATERIALIZE_SYMLINK = "symlink"
+MATERIALIZE_COPY = "copy"
+
+DEFAULT_MATERIALIZATION = MATERIALIZE_HARDLINK
+
+
+def _reflink_file(source, target):
+    """
+    Creates a copy on write clone of the source file, the data is only copied once one of the files is modified
+    """
+
+    if not fcntl:
+        raise OSError(errno.EOPNOTSUPP, "Copy on write clones are not supported on this platform")
+
+    with open(source, "rb") as source_file, open(target, "wb") as target_file:
+        fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+
+
+_MATERIALIZE_FUNCTIONS = {
+    MATERIALIZE_HARDLINK: os.link,
+    MATERIALIZE_REFLINK: _reflink_file,
+    MATERIALIZE_SYMLINK: lambda source, target: os.symlink(os.path.abspath(source), target),
+    MATERIALIZE_COPY: shutil.copy
+}
+
+
+def get_cache_compression(run_config):
+    """
+    :return: the compression to use for new cache entries
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return logfiles.get_available_compression(settings.get(ue4_constants.CACHE_COMPRESSION,
+                                                            logfiles.COMPRESSION_NONE))
+
+
+def get_cache_materializer(run_config, into_cache=False):
+    """
+    Creates the materializer from the package inspection settings in the run config
+    :param into_cache: True when placing files into the cache, the cache should never link to files outside of it
+    :return: CacheMaterializer
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    strategy = settings.get(ue4_constants.CACHE_MATERIALIZATION, DEFAULT_MATERIALIZATION)
+
+    if into_cache and strategy == MATERIALIZE_SYMLINK:
+        strategy = MATERIALIZE_COPY
+
+    return CacheMaterializer(strategy)
+
+
+class CacheMaterializer:
+    """
+    Places files into and out of the cache.  Hard links and copy on write clones avoid copying the bytes of files
+    that are the same in both places, if the file system can't do the requested strategy it falls back to copying
+    """
+
+    def __init__(self, strategy=DEFAULT_MATERIALIZATION):
+
+        if strategy not in _MATERIALIZE_FUNCTIONS:
+            L.warning("Unknown cache materialization: %s, copying files instead", strategy)
+            strategy = MATERIALIZE_COPY
+
+        self.strategy = strategy
+
+        # Switches to copy the first time the requested strategy fails
+        self._active_strategy = strategy
+
+        self.bytes_not_copied = 0
+        self.strategy_counts = {}
+
+    def materialize(self, source, target):
+        """
+        Makes the content of the source file available at the target path, replacing anything that is there
+        """
+
+        # Links can't be created over an existing file
+        if os.path.lexists(target):
+            os.remove(target)
+
+        if self._active_strategy != MATERIALIZE_COPY:
+            try:
+                _MATERIALIZE_FUNCTIONS[self._active_strategy](source, target)
+                self.bytes_not_copied += os.path.getsize(source)
+                self._count(self._active_strategy)
+                return
+
+            except OSError as e:
+                L.warning("Unable to %s %s, falling back to copying files: %s", self._active_strategy, source, e)
+                self._active_strategy = MATERIALIZE_COPY
+
+                # A failed clone can leave an empty target behind
+                if os.path.lexists(target):
+                    os.remove(target)
+
+        shutil.copy(source, target)
+        self._count(MATERIALIZE_COPY)
+
+    def _count(self, strategy):
+        self.strategy_counts[strategy] = self.strategy_counts.get(strategy, 0) + 1
+
+    def log_report(self, description):
+
+        counts = ", ".join("{} {}".format(count, strategy) for strategy, count in sorted(self.strategy_counts.items()))
+        L.info("%s using %s (%s), %s bytes not copied", description, self.strategy, counts or "no files",
+               self.bytes_not_copied)
+
+
+def migrate_flat_cache(cache_path):
+    """
+    Moves the entries of a cache that stores every entry in the root folder into the sharded layout
+    :return: number of entries moved
+    """
+
+    cache_path = pathlib.Path(cache_path)
+
+    # Rebuilding the manifest moves the flat entries it finds
+    manifest = CacheManifest(cache_path)
+    manifest.rebuild()
+
+    return manifest.migrated_entries
+
+
+def _get_flat_entries(cache_path):
+    """
+    :return: list of the entries that are stored in the root of the cache folder by the old flat layout
+    """
+
+    return [each_file for each_file in pathlib.Path(cache_path).glob("*" + CACHE_ENTRY_EXTENSION + "*")
+            if each_file.is_file()]
+
+
+def _move_flat_entries(cache_path, flat_entries):
+    """
+    :return: number of entries moved into the sharded layout
+    """
+
+    moved_entries = 0
+    for each_file in flat_entries:
+        hash_value, extension = split_entry_name(each_file.name)
+        target_file = get_cache_entry_path(cache_path, hash_value, extension)
+
+        if not target_file.parent.exists():
+            os.makedirs(target_file.parent)
+
+        os.replace(each_file, target_file)
+        moved_entries += 1
+
+        if moved_entries % 5000 == 0:
+            L.info("Moved %s cache entries", moved_entries)
+
+    L.info("Moved %s cache entries into the sharded layout", moved_entries)
+
+    return moved_entries
+
+
+class CacheManifest:
+    """
+    Append only list of the entries stored in the sentinel cache.  The manifest is read into a dict so that
+    checking if a hash value is cached never has to list the cache directory
+    """
+
+    def __init__(self, cache_path, shared=False):
+        """
+        :param shared: True for a cache folder that other agents use at the same time, like a remote cache on a
+                       network share.  Its entries are never moved and the manifest is never compacted, other agents
+                       can be appending to it
+        """
+
+        self.cache_path = pathlib.Path(cache_path)
+        self.manifest_path = self.cache_path.joinpath(MANIFEST_FILE_NAME)
+        self.shared = shared
+
+        # hash value -> extension of the entry, compressed entries have a different extension
+        self._entries = None
+
+        # Number of entries of the old flat layout that the last rebuild moved
+        self.migrated_entries = 0
+
+        # Lines in the manifest file, entries that were added and removed again leave lines behind
+        self._line_count = 0
+
+    def __contains__(self, hash_value):
+        return hash_value in self.get_entries()
+
+    def get_entries(self):
+        """
+        Reads the manifest, recreating it from the cache directory if it does not exist
+        :return: dict of hash value -> entry extension
+        """
+
+        if self._entries is None:
+            if self.manifest_path.exists():
+                self._entries = self._read_manifest()
+
+            if self._entries is None:
+                L.info("No cache manifest for the current cache layout found at: %s, rebuilding it",
+                       self.manifest_path)
+                self.rebuild()
+
+        return self._entries
+
+    def get_hash_values(self):
+        """
+        :return: set like view of the hash values in the cache
+        """
+
+        return self.get_entries().keys()
+
+    def get_entry_path(self, hash_value):
+        """
+        :return: path to the cached entry for the hash value
+        """
+
+        return get_cache_entry_path(self.cache_path, hash_value, self.get_entries()[hash_value])
+
+    def _read_manifest(self):
+        """
+        :return: dict of entries, None if the manifest was written for another cache layout
+        """
+
+        entries = {}
+        self._line_count = 0
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            if f.readline() != MANIFEST_HEADER:
+                return None
+
+            for each_line in f:
+                self._line_count += 1
+
+                # A line without a line break was cut off by an interrupted run
+                if not each_line.endswith("\n"):
+                    continue
+
+                each_line = each_line.rstrip("\n")
+                if each_line.startswith("+"):
+                    hash_value, extension = split_entry_name(each_line[1:])
+                    entries[hash_value] = extension
+                elif each_line.startswith("-"):
+                    entries.pop(each_line[1:], None)
+
+        return entries
+
+    def _get_entries_from_directory(self):
+        """
+        search through the cache folder to look for files named after hash values
+        :return: dict of entries
+        """
+
+        entries = {}
+        for each_file in self.cache_path.glob("*/*/*" + CACHE_ENTRY_EXTENSION + "*"):
+            hash_value, extension = split_entry_name(each_file.name)
+            entries[hash_value] = extension
+
+        return entries
+
+    def rebuild(self):
+        """
+        Recreates the manifest from the files that are in the cache directory, entries of the old flat layout are
+        moved into the sharded layout first so that a cache from before the upgrade is not extracted again.  The
+        entries of a shared cache are left where they are, other agents could be reading them
+        """
+
+        flat_entries = _get_flat_entries(self.cache_path)
+        if flat_entries and self.shared:
+            L.warning("Found %s cache entries in the old flat layout at: %s, they are not used until the cache is "
+                      "migrated with: cache migrate-layout", len(flat_entries), self.cache_path)
+        elif flat_entries:
+            L.warning("Found %s cache entries in the old flat layout at: %s, moving them into the sharded layout",
+                      len(flat_entries), self.cache_path)
+            self.migrated_entries = _move_flat_entries(self.cache_path, flat_entries)
+
+        entries = self._get_entries_from_directory()
+        self._write_manifest(entries)
+
+        self._entries = entries
+        L.info("Cache manifest rebuilt with %s entries", len(entries))
+
+    def compact(self):
+        """
+        Rewrites the manifest with only the entries that are in the cache, dropping the lines of removed entries
+        """
+
+        entries = self.get_entries()
+        dead_line_count = self._line_count - len(entries)
+        self._write_manifest(entries)
+
+        L.info("Cache manifest compacted to %s entries, dropped %s lines", len(entries), dead_line_count)
+
+    def _write_manifest(self, entries):
+
+        with inspectionutilities.open_for_replace(self.manifest_path) as f:
+            f.write(MANIFEST_HEADER)
+            for each_hash in sorted(entries):
+                f.write("+" + each_hash + entries[each_hash] + "\n")
+
+        self._line_count = len(entries)
+
+    def _compact_if_needed(self):
+
+        # Rewriting a shared manifest would drop the lines other agents append in the meantime
+        if self.shared:
+            return
+
+        dead_line_count = self._line_count - len(self._entries)
+        if dead_line_count > max(MANIFEST_COMPACT_MIN_DEAD_LINES, len(self._entries)):
+            self.compact()
+
+    def _append(self, prefix, names):
+
+        # Making sure a missing manifest is rebuilt before it gets appended to
+        self.get_entries()
+
+        # Written in a single call so that an interrupted run can at most cut off the last line
+        lines = "".join(prefix + each_name + "\n" for each_name in names)
+        if lines:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+            self._line_count += len(names)
+
+    def add(self, entry_names):
+        """
+        Records entries that have been written to the cache
+        :param entry_names: file names of the entries, the hash value followed by the extension
+        """
+
+        new_entries = {}
+        for each_name in entry_names:
+            hash_value, extension = split_entry_name(each_name)
+            if self.get_entries().get(hash_value) != extension:
+                new_entries[hash_value] = extension
+
+        self._append("+", [each_hash + extension for each_hash, extension in new_entries.items()])
+        self._entries.update(new_entries)
+        self._compact_if_needed()
+
+    def remove(self, hash_values):
+        """
+        Records hash values that have been removed from the cache
+        """
+
+        hash_values = [each_hash for each_hash in hash_values if each_hash in self.get_entries()]
+        self._append("-", hash_values)
+
+        for each_hash in hash_values:
+            del self._entries[each_hash]
+
+        self._compact_if_needed()
+
+
+class CacheAccessLog:
+    """
+    Keeps track of when each cache entry was last used, file access times can't be relied on as they are often
+    disabled on build agents
+    """
+
+    def __init__(self, cache_path):
+
+        self.access_log_path = pathlib.Path(cache_path).joinpath(ACCESS_LOG_FILE_NAME)
+        self._access_times = self._read_access_log()
+
+    def _read_access_log(self):
+        return inspectionutilities.read_json_file(self.access_log_path, "cache access log") or {}
+
+    def get_access_time(self, hash_value, default=0.0):
+        return self._access_times.get(hash_value, default)
+
+    def touch(self, hash_values):
+        """
+        Marks the entries as used now
+        """
+
+        access_time = time.time()
+        for each_hash in hash_values:
+            self._access_times[each_hash] = access_time
+
+    def remove(self, hash_values):
+        for each_hash in hash_values:
+            self._access_times.pop(each_hash, None)
+
+    def save(self):
+        inspectionutilities.write_json_file(self.access_log_path, self._access_times)
+
+
+class BadPackageList:
+    """
+    Packages that made the editor fail, keyed by their hash value so that a package is tried again as soon as its
+    content changes
+    """
+
+    def __init__(self, cache_path):
+
+        self.bad_packages_path = pathlib.Path(cache_path).joinpath(BAD_PACKAGES_FILE_NAME)
+        self._entries = self._read_bad_packages()
+
+    def _read_bad_packages(self):
+        return inspectionutilities.read_json_file(self.bad_packages_path, "bad package list") or {}
+
+    def __contains__(self, hash_value):
+        return hash_value in self._entries
+
+    def add(self, hash_value, asset_path, return_code):
+
+        self._entries[hash_value] = {
+            "path": str(asset_path),
+            "return_code": return_code,
+            "time": time.time()
+        }
+
+    def get_entries(self, hash_values=None):
+        """
+        :param hash_values: only return the entries for these hash values, all entries if not set
+        :return: dict of hash value -> entry
+        """
+
+        if hash_values is None:
+            return dict(self._entries)
+
+        return {each_hash: self._entries[each_hash] for each_hash in hash_values if each_hash in self._entries}
+
+    def clear(self):
+        self._entries = {}
+
+    def save(self):
+        inspectionutilities.write_json_file(self.bad_packages_path, self._entries, indent=4)
+
+
+def collect_garbage(cache_path, max_bytes, repack_target_ratio=DEFAULT_REPACK_TARGET_RATIO):
+    """
+    Removes the least recently used entries from the cache until it fits within the byte budget
+    :param repack_target_ratio: part of the budget a packed cache is repacked down to
+    :return: dict with what was removed
+    """
+
+    packs = CachePacks(cache_path)
+    has_packs = bool(packs.get_readers())
+    packs.close()
+
+    # Packed entries can only be removed by rewriting the packs
+    if has_packs:
+        return _collect_packed_garbage(cache_path, max_bytes, int(max_bytes * repack_target_ratio))
+
+    manifest = CacheManifest(cache_path)
+    access_log = CacheAccessLog(cache_path)
+
+    cached_entries = []
+    missing_entries = []
+    cache_size = 0
+    for each_hash in list(manifest.get_hash_values()):
+        entry_path = manifest.get_entry_path(each_hash)
+
+        try:
+            stat = os.stat(entry_path)
+        except FileNotFoundError:
+            # Removed from outside of sentinel, only the manifest needs cleaning up
+            missing_entries.append(each_hash)
+            continue
+
+        # Entries that were never looked up since the access log existed fall back to when they were written
+        last_access = access_log.get_access_time(each_hash, stat.st_mtime)
+        cached_entries.append((last_access, stat.st_size, each_hash, entry_path))
+        cache_size += stat.st_size
+
+    evicted_entries = []
+    freed_bytes = 0
+    if cache_size > max_bytes:
+        cached_entries.sort(key=lambda entry: entry[0])
+
+        for last_access, entry_size, each_hash, entry_path in cached_entries:
+            if cache_size <= max_bytes:
+                break
+
+            os.remove(entry_path)
+            evicted_entries.append(each_hash)
+            cache_size -= entry_size
+            freed_bytes += entry_size
+
+    manifest.remove(evicted_entries + missing_entries)
+    access_log.remove(evicted_entries + missing_entries)
+    access_log.save()
+
+    L.info("Cache garbage collection removed %s entries (%s bytes), %s bytes left of %s bytes budget",
+           len(evicted_entries), freed_bytes, cache_size, max_bytes)
+
+    return {
+        "entries_evicted": len(evicted_entries),
+        "entries_missing": len(missing_entries),
+        "bytes_freed": freed_bytes,
+        "bytes_in_cache": cache_size,
+        "max_bytes": max_bytes
+    }
+
+
+def run_garbage_collection(run_config, max_bytes=0):
+    """
+    Runs the garbage collection on the cache from the run config
+    :param max_bytes: overrides the byte budget from the package inspection settings if set
+    :return: dict with what was removed
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    if not max_bytes:
+        max_bytes = settings.get(ue4_constants.CACHE_MAX_BYTES, DEFAULT_CACHE_MAX_BYTES)
+
+    cache_path = run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT]
+
+    return collect_garbage(cache_path, max_bytes,
+                           settings.get(ue4_constants.CACHE_REPACK_TARGET_RATIO, DEFAULT_REPACK_TARGET_RATIO))
+
+
+def _collect_packed_garbage(cache_path, max_bytes, target_bytes):
+    """
+    Repacks the cache into a single pack with the most recently used entries if it is over the byte budget.  Every
+    repack rewrites the whole cache, so it keeps only the entries that fit in the target below the budget
+    :return: dict with what was removed
+    """
+
+    packs = CachePacks(cache_path)
+    cache_size = packs.get_total_size()
+    packs.close()
+
+    manifest = CacheManifest(cache_path)
+    for each_hash in manifest.get_hash_values():
+        try:
+            cache_size += os.path.getsize(manifest.get_entry_path(each_hash))
+        except FileNotFoundError:
+            pass
+
+    if cache_size <= max_bytes:
+        L.info("Cache is %s bytes of %s bytes budget, nothing to remove", cache_size, max_bytes)
+        return {
+            "entries_evicted": 0,
+            "entries_missing": 0,
+            "bytes_freed": 0,
+            "bytes_in_cache": cache_size,
+            "max_bytes": max_bytes
+        }
+
+    result = repack(cache_path, target_bytes)
+    result["bytes_freed"] = max(0, cache_size - result["bytes_in_cache"])
+    result["max_bytes"] = max_bytes
+
+    return result
+
+
+def get_cache_storage(run_config):
+    """
+    :return: loose to keep every entry in its own file, pack to move new entries into pack files
+    """
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return settings.get(ue4_constants.CACHE_STORAGE, CACHE_STORAGE_LOOSE)
+
+
+def should_collect_garbage_after_refresh(run_config):
+
+    settings = inspectionutilities.get_inspection_settings(run_config)
+    return settings.get(ue4_constants.CACHE_GC_AFTER_REFRESH, True)
+
+
+class PackWriter:
+    """
+    Appends cache entries to a single pack file.  The index with the offset of every entry is sorted by hash value
+    and only written once the pack is complete, a pack without an index is never read
+    """
+
+    def __init__(self, pack_folder):
+
+        self.pack_folder = pathlib.Path(pack_folder)
+        os.makedirs(self.pack_folder, exist_ok=True)
+
+        pack_name = "pack-{}-{}-{:06d}".format(int(time.time() * 1000), os.getpid(), next(_pack_numbers))
+        self.pack_path = self.pack_folder.joinpath(pack_name + ".pack")
+        self.index_path = self.pack_folder.joinpath(pack_name + ".idx")
+
+        self._temp_pack_path = self.pack_path.with_suffix(".packtmp")
+        self._pack_file = open(self._temp_pack_path, "wb")
+        self._pack_file.write(PACK_MAGIC)
+
+        # hash value -> (extension, offset, length)
+        self._records = {}
+
+    def add(self, hash_value, extension, data):
+        """
+        Appends the data of an entry to the pack, entries that are already in the pack are skipped
+        """
+
+        if hash_value in self._records:
+            return
+
+        if len(hash_value) > PACK_INDEX_KEY_SIZE:
+            raise ValueError("Hash value is too long to be packed: " + hash_value)
+
+        offset = self._pack_file.tell()
+        self._pack_file.write(data)
+        self._records[hash_value] = (extension, offset, len(data))
+
+    def add_file(self, hash_value, extension, file_path):
+
+        with open(file_path, "rb") as f:
+            self.add(hash_value, extension, f.read())
+
+    def close(self):
+        """
+        Finishes the pack and writes the sorted index next to it
+        :return: path to the pack, None if nothing was added
+        """
+
+        self._pack_file.close()
+
+        if not self._records:
+            os.remove(self._temp_pack_path)
+            return None
+
+        os.replace(self._temp_pack_path, self.pack_path)
+
+        temp_index_path = self.index_path.with_suffix(".idxtmp")
+        with open(temp_index_path, "wb") as f:
+            f.write(PACK_INDEX_HEADER.pack(PACK_INDEX_MAGIC, len(self._records)))
+
+            for each_hash in sorted(self._records):
+                extension, offset, length = self._records[each_hash]
+                f.write(PACK_INDEX_RECORD.pack(each_hash.encode("ascii"), extension.encode("ascii"), offset, length))
+
+        os.replace(temp_index_path, self.index_path)
+
+        L.info("Wrote %s entries to pack: %s", len(self._records), self.pack_path)
+
+        return self.pack_path
+
+
+class PackReader:
+    """
+    Reads entries from a pack file, both the index and the pack are memory mapped and entries are found with a
+    binary search over the sorted index
+    """
+
+    def __init__(self, index_path):
+
+        self.index_path = pathlib.Path(index_path)
+        self.pack_path = self.index_path.with_suffix(".pack")
+
+        self._index_file = open(self.index_path, "rb")
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.entry_count = PACK_INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != PACK_INDEX_MAGIC:
+            self.close()
+            raise ValueError("Not a pack index: " + str(self.index_path))
+
+        self._pack_file = open(self.pack_path, "rb")
+        self._pack = mmap.mmap(self._pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _get_record_offset(self, record_number):
+        return PACK_INDEX_HEADER.size + record_number * PACK_INDEX_RECORD.size
+
+    def _get_record(self, record_number):
+        """
+        :return: tuple of hash value, extension, offset and length
+        """
+
+        key, extension, offset, length = PACK_INDEX_RECORD.unpack_from(self._index,
+                                                                        self._get_record_offset(record_number))
+
+        return key.rstrip(b"\0").decode("ascii"), extension.rstrip(b"\0").decode("ascii"), offset, length
+
+    def get_records(self):
+        for each_record_number in range(self.entry_count):
+            yield self._get_record(each_record_number)
+
+    def find(self, hash_value):
+        """
+        :return: tuple of the extension, offset and length of the entry, None if it is not in the pack
+        """
+
+        key = hash_value.encode("ascii").ljust(PACK_INDEX_KEY_SIZE, b"\0")
+
+        low = 0
+        high = self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            record_offset = self._get_record_offset(middle)
+
+            if self._index[record_offset:record_offset + PACK_INDEX_KEY_SIZE] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.entry_count:
+            record_hash, extension, offset, length = self._get_record(low)
+            if record_hash == hash_value:
+                return extension, offset, length
+
+        return None
+
+    def read(self, offset, length):
+        return self._pack[offset:offset + length]
+
+    def close(self):
+
+        self._index.close()
+        self._index_file.close()
+
+        if hasattr(self, "_pack"):
+            self._pack.close()
+            self._pack_file.close()
+
+
+class CachePacks:
+    """
+    All the pack files in the cache, the newest pack is checked first
+    """
+
+    def __init__(self, cache_path):
+
+        self.pack_folder = pathlib.Path(cache_path).joinpath(PACK_FOLDER_NAME)
+        self._readers = None
+
+    def get_readers(self):
+
+        if self._readers is None:
+            self._readers = []
+
+            for each_index in sorted(self.pack_folder.glob("*.idx"), reverse=True):
+                try:
+                    self._readers.append(PackReader(each_index))
+                except (ValueError, OSError) as e:
+                    L.warning("Unable to read pack: %s, %s", each_index, e)
+
+        return self._readers
+
+    def find(self, hash_value):
+        """
+        :return: tuple of the pack reader and the record of the entry, None if no pack has the entry
+        """
+
+        for each_reader in self.get_readers():
+            record = each_reader.find(hash_value)
+            if record:
+                return each_reader, record
+
+        return None
+
+    def __contains__(self, hash_value):
+        return self.find(hash_value) is not None
+
+    def extract_entry(self, hash_value, target_folder):
+        """
+        Writes the entry out to a file in the target folder
+        :return: path to the file
+        """
+
+        reader, (extension, offset, length) = self.find(hash_value)
+        target_path = pathlib.Path(target_folder).joinpath(hash_value + extension)
+
+        with open(target_path, "wb") as f:
+            f.write(reader.read(offset, length))
+
+        return target_path
+
+    def get_total_size(self):
+        return sum(os.path.getsize(each_reader.pack_path) for each_reader in self.get_readers())
+
+    def close(self):
+
+        for each_reader in self._readers or []:
+            each_reader.close()
+
+        self._readers = None
+
+
+def _remove_packed_entry_file(entry_path):
+    """
+    Removes a loose entry that was moved into a pack, together with its shard folders once they are empty so that
+    packing doesn't leave a folder behind for every entry
+    """
+
+    entry_path = pathlib.Path(entry_path)
+    os.remove(entry_path)
+
+    for each_folder in (entry_path.parent, entry_path.parent.parent):
+        try:
+            os.rmdir(each_folder)
+        except OSError:
+            # Still has other entries in it
+            break
+
+
+def pack_loose_entries(cache_path, hash_values):
+    """
+    Moves loose entries into a new pack
+    """
+
+    manifest = CacheManifest(cache_path)
+    writer = PackWriter(pathlib.Path(cache_path).joinpath(PACK_FOLDER_NAME))
+
+    packed_hash_values = []
+    for each_hash in hash_values:
+        if each_hash in manifest:
+            writer.add_file(each_hash, manifest.get_entries()[each_hash], manifest.get_entry_path(each_hash))
+            packed_hash_values.append(each_hash)
+
+    writer.close()
+
+    # The loose files are only removed once the pack and its index are in place
+    for each_hash in packed_hash_values:
+        _remove_packed_entry_file(manifest.get_entry_path(each_hash))
+
+    manifest.remove(packed_hash_values)
+
+
+def repack(cache_path, max_bytes=0):
+    """
+    Compacts every pack and loose entry into a single pack, dropping entries that are in more than one pack.  If a
+    byte budget is given only the most recently used entries that fit are kept
+    :return: dict with what was removed
+    """
+
+    manifest = CacheManifest(cache_path)
+    packs = CachePacks(cache_path)
+    access_log = CacheAccessLog(cache_path)
+
+    # hash value -> (last access, size, read function, extension)
+    entries = {}
+    for each_reader in packs.get_readers():
+        pack_time = os.path.getmtime(each_reader.pack_path)
+
+        for each_hash, extension, offset, length in each_reader.get_records():
+            if each_hash not in entries:
+                read_entry = (lambda reader, start, size: lambda: reader.read(start, size))(each_reader, offset, length)
+                entries[each_hash] = (access_log.get_access_time(each_hash, pack_time), length, read_entry, extension)
+
+    loose_hash_values = list(manifest.get_hash_values())
+    for each_hash in loose_hash_values:
+        entry_path = manifest.get_entry_path(each_hash)
+        if not entry_path.exists():
+            continue
+
+        stat = os.stat(entry_path)
+        read_entry = (lambda path: lambda: path.read_bytes())(entry_path)
+        entries[each_hash] = (access_log.get_access_time(each_hash, stat.st_mtime), stat.st_size, read_entry,
+                              manifest.get_entries()[each_hash])
+
+    ordered_hash_values = sorted(entries, key=lambda each_hash: entries[each_hash][0], reverse=True)
+
+    writer = PackWriter(packs.pack_folder)
+    dropped_hash_values = []
+    cache_size = 0
+    for each_hash in ordered_hash_values:
+        last_access, entry_size, read_entry, extension = entries[each_hash]
+
+        if max_bytes and cache_size + entry_size > max_bytes:
+            dropped_hash_values.append(each_hash)
+            continue
+
+        writer.add(each_hash, extension, read_entry())
+        cache_size += entry_size
+
+    writer.close()
+
+    # Removing what was compacted into the new pack
+    old_pack_files = []
+    for each_reader in packs.get_readers():
+        old_pack_files.extend([each_reader.pack_path, each_reader.index_path])
+    packs.close()
+
+    for each_file in old_pack_files:
+        os.remove(each_file)
+
+    for each_hash in loose_hash_values:
+        entry_path = manifest.get_entry_path(each_hash)
+        if entry_path.exists():
+            _remove_packed_entry_file(entry_path)
+
+    manifest.remove(loose_hash_values)
+    access_log.remove(dropped_hash_values)
+    access_log.save()
+
+    L.info("Repacked %s entries (%s bytes), dropped %s entries", len(entries) - len(dropped_hash_values), cache_size,
+           len(dropped_hash_values))
+
+    return {
+        "entries_packed": len(entries) - len(dropped_hash_values),
+        "entries_evicted": len(dropped_hash_values),
+        "entries_missing": 0,
+        "bytes_freed": 0,
+        "bytes_in_cache": cache_size,
+        "max_bytes": max_bytes
+    }
+
+
+def benchmark_cache_storage(entry_count=10000, entry_size=4096):
+    """
+    Compares how fast entries can be looked up and read when they are stored as loose files and in a pack
+    :return: dict of storage -> results
+    """
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_folder:
+        hash_values = [hashlib.md5(str(i).encode("utf-8")).hexdigest() for i in range(entry_count)]
+        data = os.urandom(entry_size)
+
+        loose_path = pathlib.Path(temp_folder).joinpath("loose")
+        for each_hash in hash_values:
+            entry_path = get_cache_entry_path(loose_path, each_hash)
+            os.makedirs(entry_path.parent, exist_ok=True)
+            entry_path.write_bytes(data)
+        CacheManifest(loose_path).rebuild()
+
+        packed_path = pathlib.Path(temp_folder).joinpath("packed")
+        writer = PackWriter(packed_path.joinpath(PACK_FOLDER_NAME))
+        for each_hash in hash_values:
+            writer.add(each_hash, CACHE_ENTRY_EXTENSION, data)
+        writer.close()
+
+        # Looking the entries up in a different order than they were written
+        lookup_order = sorted(hash_values)
+
+        start_time = time.perf_counter()
+        manifest = CacheManifest(loose_path)
+        for each_hash in lookup_order:
+            with open(manifest.get_entry_path(each_hash), "rb") as f:
+                f.read()
+        results[CACHE_STORAGE_LOOSE] = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        packs = CachePacks(packed_path)
+        for each_hash in lookup_order:
+            reader, (extension, offset, length) = packs.find(each_hash)
+            reader.read(offset, length)
+        packs.close()
+        results[CACHE_STORAGE_PACK] = time.perf_counter() - start_time
+
+    megabytes = entry_count * entry_size / (1024 * 1024)
+    for each_storage, elapsed_seconds in results.items():
+        results[each_storage] = inspectionutilities.get_throughput(elapsed_seconds, entries=entry_count,
+                                                                   mb=megabytes)
+
+    return results
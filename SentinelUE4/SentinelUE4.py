@@ -7,7 +7,8 @@ import pprint
 import click
 
 import ue4_constants
-from Editor import buildcommands, commandlets, packageinspection, automationrunner
+from Editor import buildcommands, commandlets, packageinspection, automationrunner, contenthashing, editorutilities, \
+    remotecache, sentinelcache
 from Game import clientrunner, clientutilities
 
 L = logging.getLogger(__name__)
@@ -170,20 +171,130 @@ def refresh_asset_info(ctx):
     """ extracts raw information about assets"""
     run_config = ctx.obj['RUN_CONFIG']
 
-    # Runs package inspection on all the files
+    # Runs package inspection on all the files, every chunk is split into package logs and archived as it finishes
     inspector = packageinspection.BasePackageInspection(run_config)
     inspector.run()
 
-    # Splits the raw inspected files into individual files
-    splitter = packageinspection.RawLogSplitter(run_config, inspector.extracted_files)
-    splitter.run()
+    # Converts the package logs to json on a pool of workers
+    converter = packageinspection.PackageLogConverter(run_config, inspector.hash_mapping)
+    converter.run()
 
-    # Archive the newly created files
-    packageinspection.archive_list_of_files(run_config, splitter.output_files)
+    # Keeps the cache within its size budget
+    if sentinelcache.should_collect_garbage_after_refresh(run_config):
+        sentinelcache.run_garbage_collection(run_config)
 
-    # TODO move the convert file list to the same pattern as the inspector and the splitter
-    packageinspection.convert_file_list_to_json(run_config)
 
+@project.command()
+@click.pass_context
+@click.option('--workers', default=0, help="Number of hashing workers, 0 uses one per core")
+def benchmark_hashing(ctx, workers):
+    """ compares the content hash algorithms on the project files"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    editor_util = editorutilities.UE4EditorUtilities(run_config)
+    results = contenthashing.benchmark_hash_algorithms(editor_util.get_all_content_files(), workers)
+
+    if ctx.obj['OUTPUT_TYPE'] == 'text':
+        for each_algorithm, each_result in results.items():
+            print("{}: {:.1f} MB/s, {:.1f} files/s, {} bit digest, {} collisions".format(
+                each_algorithm, each_result["mb_per_second"], each_result["files_per_second"],
+                each_result["digest_bits"], each_result["collisions"]))
+    elif ctx.obj['OUTPUT_TYPE'] == 'json':
+        print(json.dumps(results, indent=4))
+
+
+
+@cli.group()
+def cache():
+    """Maintain the sentinel cache"""
+
+
+@cache.command()
+@click.pass_context
+def rebuild_manifest(ctx):
+    """ recreates the cache manifest from the cache directory"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+    sentinelcache.CacheManifest(cache_path).rebuild()
+
+
+@cache.command()
+@click.pass_context
+def migrate_layout(ctx):
+    """ moves the entries of a flat cache into the sharded layout"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+    sentinelcache.migrate_flat_cache(cache_path)
+
+
+@cache.command()
+@click.pass_context
+@click.option('--max_bytes', default=0, help="Size budget of the cache, uses the config if not set")
+def collect_garbage(ctx, max_bytes):
+    """ removes the least recently used entries until the cache fits its size budget"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    result = sentinelcache.run_garbage_collection(run_config, max_bytes)
+
+    if ctx.obj['OUTPUT_TYPE'] == 'json':
+        print(json.dumps(result, indent=4))
+
+
+@cache.command()
+@click.pass_context
+@click.option('--max_bytes', default=0, help="Only keep the most recently used entries that fit, 0 keeps everything")
+def repack(ctx, max_bytes):
+    """ compacts the packs and loose entries of the cache into a single pack"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+    result = sentinelcache.repack(cache_path, max_bytes)
+
+    if ctx.obj['OUTPUT_TYPE'] == 'json':
+        print(json.dumps(result, indent=4))
+
+
+@cache.command()
+@click.pass_context
+@click.option('--entries', default=10000, help="Number of entries to read")
+@click.option('--size', default=4096, help="Size of each entry in bytes")
+def benchmark_storage(ctx, entries, size):
+    """ compares reading entries stored as loose files and in a pack"""
+    results = sentinelcache.benchmark_cache_storage(entries, size)
+
+    if ctx.obj['OUTPUT_TYPE'] == 'text':
+        for each_storage, each_result in results.items():
+            print("{}: {:.0f} entries/s, {:.1f} MB/s".format(each_storage, each_result["entries_per_second"],
+                                                             each_result["mb_per_second"]))
+    elif ctx.obj['OUTPUT_TYPE'] == 'json':
+        print(json.dumps(results, indent=4))
+
+
+@cache.command()
+@click.pass_context
+def clear_bad_packages(ctx):
+    """ forgets the packages that made the editor fail so they are extracted again"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+    bad_packages = sentinelcache.BadPackageList(cache_path)
+    bad_packages.clear()
+    bad_packages.save()
+
+
+@cache.command()
+@click.pass_context
+@click.option('--port', default=8765, help="Port to serve the cache on")
+@click.option('--host', default=remotecache.DEFAULT_SERVER_HOST,
+              help="Address to serve the cache on, 0.0.0.0 makes it reachable from other machines")
+def serve(ctx, port, host):
+    """ serves the cache so that other agents can use it as their remote cache"""
+    run_config = ctx.obj['RUN_CONFIG']
+
+    cache_path = pathlib.Path(run_config[ue4_constants.ENVIRONMENT_CATEGORY][ue4_constants.SENTINEL_CACHE_ROOT])
+    remotecache.serve_cache(cache_path, port, host, remotecache.get_remote_cache_token(run_config))
 
 
 @cli.group()
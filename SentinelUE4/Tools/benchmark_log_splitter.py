@@ -0,0 +1,157 @@
+"""
+Benchmarks splitting raw package info logs into package logs, compares decoding the log line by line with the single
+pass over the memory mapped log.  Scanning only finds the packages, splitting also writes every package out
+
+    python SentinelUE4/Tools/benchmark_log_splitter.py --size_mb 2048
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+import click
+
+# Running as a script from the tools folder, the pipeline modules are imported from the component root
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from Editor import packageinspection
+from Editor.LogProcesser import logfiles
+from Tools import fake_editor
+
+
+L = logging.getLogger(__name__)
+
+# Number of different summaries in the generated log, every package in the log still gets its own path
+DISTINCT_SUMMARIES = 5000
+
+
+class SyntheticHashMapping:
+    """
+    Hash mapping for packages that only exist in the generated log, the hash value is derived from the path
+    """
+
+    def get_hash_from_filename(self, filename):
+        return hashlib.md5(str(filename).encode("utf-8")).hexdigest()
+
+
+def write_raw_log(log_path, size_mb, work_folder):
+    """
+    Writes a raw package info log of about the given size out of fake editor output
+    :return: number of packages in the log
+    """
+
+    summaries = []
+    for i in range(DISTINCT_SUMMARIES):
+        package_path = pathlib.Path(work_folder).joinpath("Content", "Assets", "SM_Asset_{:09d}.uasset".format(i))
+        summaries.append(("\n".join(fake_editor.get_package_summary(package_path)) + "\n").encode("utf-8"))
+
+    target_size = size_mb * 1024 * 1024
+    package_count = 0
+    with open(log_path, "wb") as f:
+        f.write(b"LogInit: Display: Running engine for game: FakeProject\n")
+
+        while f.tell() < target_size:
+            summary_number = package_count % DISTINCT_SUMMARIES
+            f.write(summaries[summary_number].replace("Asset_{:09d}".format(summary_number).encode("utf-8"),
+                                                      "Asset_{:09d}".format(package_count).encode("utf-8")))
+            package_count += 1
+
+    return package_count
+
+
+def benchmark_log_splitter(size_mb, work_folder=None):
+    """
+    :return: dict of split method -> results
+    """
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        work_folder = pathlib.Path(work_folder or temp_folder)
+        os.makedirs(work_folder, exist_ok=True)
+
+        log_path = work_folder.joinpath("0_raw_package_info.log")
+        package_count = write_raw_log(log_path, size_mb, work_folder)
+        log_size = os.path.getsize(log_path)
+
+        results = {}
+        for each_method, each_function in [("scan lines", scan_log_lines), ("scan mapped", scan_mapped_log),
+                                           ("split lines", None), ("split mapped", None)]:
+            # Every method writes into its own folder so none of them pays for replacing the files of another
+            output_folder = work_folder.joinpath("Artifacts", each_method.replace(" ", "_"))
+
+            start_time = time.perf_counter()
+            if each_function:
+                found_packages = each_function(log_path)
+            elif each_method == "split lines":
+                found_packages = len(packageinspection.split_log_lines(log_path, output_folder,
+                                                                       SyntheticHashMapping()))
+            else:
+                found_packages = len(packageinspection.split_mapped_log(log_path, output_folder,
+                                                                        SyntheticHashMapping()))
+            elapsed_seconds = max(time.perf_counter() - start_time, 1e-9)
+
+            results[each_method] = {
+                "seconds": elapsed_seconds,
+                "packages": found_packages,
+                "mb_per_second": log_size / (1024 * 1024) / elapsed_seconds,
+                "packages_per_second": package_count / elapsed_seconds
+            }
+
+    return results
+
+
+def scan_log_lines(log_path):
+    """
+    Finds the packages and their filenames the way the line splitter does
+    :return: number of packages
+    """
+
+    package_count = 0
+    with logfiles.open_log_file(log_path) as infile:
+        for line in infile:
+            if packageinspection.is_start_of_package_summary(line):
+                package_count += 1
+            elif "Filename: " in line:
+                os.path.abspath(line.split("Filename: ")[1].replace("\n", ""))
+
+    return package_count
+
+
+def scan_mapped_log(log_path):
+    """
+    Finds the packages and their filenames the way the memory mapped splitter does
+    :return: number of packages
+    """
+
+    with open(log_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_log:
+            return sum(1 for each_summary in packageinspection.find_package_summaries(mapped_log))
+
+
+@click.command()
+@click.option('--size_mb', default=1024, help="Size of the generated raw log")
+@click.option('--work_folder', default="", help="Keeps the generated log and the split packages in this folder")
+@click.option('--output', type=click.Choice(['text', 'json']), default='text', help="Output type.")
+def cli(size_mb, work_folder, output):
+    """Benchmarks splitting raw package info logs"""
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = benchmark_log_splitter(size_mb, work_folder or None)
+
+    if output == 'text':
+        for each_method, each_result in results.items():
+            print("{}: {:.1f} MB/s, {:.0f} packages/s, {:.2f}s".format(each_method, each_result["mb_per_second"],
+                                                                      each_result["packages_per_second"],
+                                                                      each_result["seconds"]))
+    elif output == 'json':
+        print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,175 @@
+"""
+Benchmarks parsing package logs into the data that is written out as json, reports the cost of a package with the
+log already in memory and with reading the log from disk, and the peak memory of parsing one very large log
+
+    python SentinelUE4/Tools/benchmark_package_log_parser.py --packages 5000 --large_log_mb 256
+"""
+
+import json
+import logging
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+# Running as a script from the tools folder, the pipeline modules are imported from the component root
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import Editor.LogProcesser.packageinfolog as PackageInfoLog
+from Tools import fake_editor
+
+
+L = logging.getLogger(__name__)
+
+
+def write_package_logs(log_folder, package_count):
+    """
+    Writes a package log for every package the way the splitter writes them out of the commandlet output
+    :return: list of the log paths
+    """
+
+    log_folder = pathlib.Path(log_folder)
+    log_folder.mkdir(parents=True, exist_ok=True)
+
+    log_paths = []
+    for i in range(package_count):
+        package_path = log_folder.joinpath("Project", "Content", "Assets", "SM_Asset_{:06d}.uasset".format(i))
+
+        log_path = log_folder.joinpath("{:032x}.log".format(i))
+        with open(log_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(fake_editor.get_package_summary(package_path)) + "\n")
+
+        log_paths.append(log_path)
+
+    return log_paths
+
+
+def parse_from_disk(log_paths):
+
+    for each_log in log_paths:
+        PackageInfoLog.PkgLogObject(each_log).get_data()
+
+
+def parse_in_memory(log_paths):
+
+    log_lines = {}
+    for each_log in log_paths:
+        with open(each_log, encoding="utf-8") as f:
+            log_lines[each_log] = f.readlines()
+
+    start_time = time.perf_counter()
+    for each_log in log_paths:
+        dict(PackageInfoLog.PkgLogObject(each_log).iter_data(log_lines[each_log]))
+
+    return time.perf_counter() - start_time
+
+
+def write_large_package_log(log_path, size_mb):
+    """
+    Writes the log of a package with a chapter that goes on for the given size, like the export table of a big map
+    """
+
+    package_path = pathlib.Path(log_path).parent.joinpath("Project", "Content", "Maps", "L_Large.umap")
+    summary = fake_editor.get_package_summary(package_path)
+
+    target_size = size_mb * 1024 * 1024
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(summary) + "\n")
+        f.write("Exports:\n")
+
+        export_number = 0
+        while f.tell() < target_size:
+            f.write("\t{:>8}) StaticMeshActor /Game/Maps/L_Large.L_Large:PersistentLevel.StaticMeshActor_{}\n".format(
+                export_number, export_number))
+            export_number += 1
+
+        f.write(fake_editor.CHAPTER_DIVIDER + "\n")
+
+
+def measure_large_log(size_mb):
+    """
+    :return: seconds and peak memory in bytes of parsing a large log from disk
+    """
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        log_path = pathlib.Path(temp_folder).joinpath("large.log")
+        write_large_package_log(log_path, size_mb)
+
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        PackageInfoLog.PkgLogObject(log_path).get_data()
+        elapsed_seconds = time.perf_counter() - start_time
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return elapsed_seconds, peak_bytes
+
+
+def benchmark_package_log_parser(package_count, repeats=3, large_log_mb=0):
+    """
+    :return: dict of measurement -> results, the best of the repeats is kept
+    """
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        log_paths = write_package_logs(temp_folder, package_count)
+
+        measurements = {"in memory": [], "from disk": []}
+        for i in range(repeats):
+            measurements["in memory"].append(parse_in_memory(log_paths))
+
+            start_time = time.perf_counter()
+            parse_from_disk(log_paths)
+            measurements["from disk"].append(time.perf_counter() - start_time)
+
+    results = {}
+    for each_measurement, each_seconds in measurements.items():
+        elapsed_seconds = max(min(each_seconds), 1e-9)
+        results[each_measurement] = {
+            "seconds": elapsed_seconds,
+            "microseconds_per_package": elapsed_seconds / package_count * 1000000,
+            "packages_per_second": package_count / elapsed_seconds
+        }
+
+    if large_log_mb:
+        elapsed_seconds, peak_bytes = measure_large_log(large_log_mb)
+        results["large log"] = {
+            "seconds": elapsed_seconds,
+            "log_mb": large_log_mb,
+            "peak_memory_mb": peak_bytes / (1024 * 1024)
+        }
+
+    return results
+
+
+@click.command()
+@click.option('--packages', default=2000, help="Number of package logs to parse")
+@click.option('--repeats', default=3, help="Number of times the logs are parsed, the fastest run is reported")
+@click.option('--large_log_mb', default=0, help="Size of a single large log to measure the peak memory on, 0 skips it")
+@click.option('--output', type=click.Choice(['text', 'json']), default='text', help="Output type.")
+def cli(packages, repeats, large_log_mb, output):
+    """Benchmarks parsing package logs"""
+
+    logging.basicConfig(level=logging.ERROR)
+
+    results = benchmark_package_log_parser(packages, repeats, large_log_mb)
+
+    if output == 'text':
+        for each_measurement, each_result in results.items():
+            if "peak_memory_mb" in each_result:
+                print("{}: {} MB log, {:.2f} MB peak memory, {:.2f}s".format(each_measurement, each_result["log_mb"],
+                                                                           each_result["peak_memory_mb"],
+                                                                           each_result["seconds"]))
+                continue
+
+            print("{}: {:.1f} us/package, {:.0f} packages/s".format(each_measurement,
+                                                                     each_result["microseconds_per_package"],
+                                                                     each_result["packages_per_second"]))
+    elif output == 'json':
+        print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,204 @@
+"""
+Benchmarks the package inspection pipeline end to end on a synthetic project, the editor is replaced with the fake
+editor so the benchmark runs without an engine install
+
+    python SentinelUE4/Tools/benchmark_pipeline.py --assets 2000 --workers 4 --asset_delay 0.002
+"""
+
+import json
+import logging
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+import click
+
+# Running as a script from the tools folder, the pipeline modules are imported from the component root
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import ue4_constants
+from Editor import packageinspection
+from Tools import fake_editor
+
+
+L = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = pathlib.Path(__file__).resolve().parents[2].joinpath("SentinelEnvironment", "defaultConfig")
+
+PROJECT_NAME = "FakeProject"
+
+# Folders the synthetic assets are spread over, with the naming prefix of the assets in it
+CONTENT_FOLDERS = {
+    "Environment/Meshes": "SM_",
+    "Environment/Textures": "T_",
+    "Environment/Materials": "M_",
+    "Characters/Meshes": "SK_",
+    "Characters/Materials": "MI_",
+    "Blueprints": "BP_",
+    "Audio": "A_",
+    "Data": "DA_",
+}
+
+
+def read_default_config():
+    """
+    Reads the default config folders the same way the environment component assembles them
+    :return: run config without the environment category
+    """
+
+    run_config = {}
+    for each_category in DEFAULT_CONFIG_PATH.iterdir():
+        if not each_category.is_dir():
+            continue
+
+        category_dict = {}
+        for each_file in each_category.glob("**/*.json"):
+            with open(each_file) as f:
+                category_dict[each_file.with_suffix("").name] = json.load(f)
+
+        # A category with a single file is the content of that file
+        if len(category_dict) == 1:
+            run_config[each_category.name] = list(category_dict.values())[0]
+        else:
+            run_config[each_category.name] = category_dict
+
+    return run_config
+
+
+def create_synthetic_project(project_root, asset_count, seed=0):
+    """
+    Writes a project with assets of varied sizes, most assets are small with a few large ones like in a real project
+    :return: list of the asset paths
+    """
+
+    generator = random.Random(seed)
+    project_root = pathlib.Path(project_root)
+
+    os.makedirs(project_root, exist_ok=True)
+    with open(project_root.joinpath(PROJECT_NAME + ".uproject"), "w") as f:
+        json.dump({"FileVersion": 3, "EngineAssociation": "4.26"}, f)
+
+    folders = list(CONTENT_FOLDERS.items())
+    asset_paths = []
+    for i in range(asset_count):
+        folder, prefix = generator.choice(folders)
+        asset_path = project_root.joinpath("Content", folder, "{}Asset_{:06d}.uasset".format(prefix, i))
+        os.makedirs(asset_path.parent, exist_ok=True)
+
+        asset_size = min(int(generator.lognormvariate(10, 1.5)), 16 * 1024 * 1024)
+        with open(asset_path, "wb") as f:
+            f.write(generator.getrandbits(64).to_bytes(8, "little") * (asset_size // 8 + 1))
+
+        asset_paths.append(asset_path)
+
+    return asset_paths
+
+
+def create_run_config(work_folder, worker_count, settings=None):
+    """
+    Creates a run config that points the pipeline at the synthetic project and the fake editor
+    """
+
+    work_folder = pathlib.Path(work_folder)
+    run_config = read_default_config()
+
+    engine_root = work_folder.joinpath("Engine")
+    engine_structure = run_config[ue4_constants.UNREAL_ENGINE_STRUCTURE]
+    fake_editor.write_launcher(engine_root.joinpath(engine_structure[ue4_constants.UNREAL_ENGINE_BINARIES_ROOT],
+                                                    "Win64",
+                                                    engine_structure[ue4_constants.UNREAL_ENGINE_WIN64_CMD_EXE] +
+                                                    ".exe"))
+
+    run_config[ue4_constants.ENVIRONMENT_CATEGORY] = {
+        ue4_constants.UNREAL_PROJECT_ROOT: work_folder.joinpath("Project").as_posix(),
+        ue4_constants.ENGINE_ROOT_PATH: engine_root.as_posix(),
+        ue4_constants.SENTINEL_ARTIFACTS_ROOT_PATH: work_folder.joinpath("Artifacts").as_posix(),
+        ue4_constants.SENTINEL_CACHE_ROOT: work_folder.joinpath("Cache").as_posix(),
+    }
+
+    inspection_settings = run_config.setdefault(ue4_constants.PACKAGE_INSPECTION_SETTINGS, {})
+    inspection_settings[ue4_constants.EXTRACT_WORKERS] = worker_count
+    inspection_settings.update(settings or {})
+
+    return run_config
+
+
+def run_pipeline(run_config):
+    """
+    Runs the stages of refresh-asset-info
+    :return: dict of stage -> seconds, number of packages that were extracted
+    """
+
+    timings = {}
+
+    start_time = time.perf_counter()
+    inspector = packageinspection.BasePackageInspection(run_config)
+    inspector.run()
+    timings["inspection"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    packageinspection.convert_file_list_to_json(run_config, inspector.hash_mapping)
+    timings["convert"] = time.perf_counter() - start_time
+
+    timings["total"] = sum(timings.values())
+
+    return timings, len(inspector.extracted_files)
+
+
+def benchmark_pipeline(asset_count, worker_count, startup_delay=0.0, asset_delay=0.0, work_folder=None,
+                       settings=None):
+    """
+    Runs the pipeline on an empty cache and again on the cache that the first run filled
+    :return: dict of run -> results
+    """
+
+    os.environ[fake_editor.STARTUP_DELAY_VARIABLE] = str(startup_delay)
+    os.environ[fake_editor.ASSET_DELAY_VARIABLE] = str(asset_delay)
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        work_folder = pathlib.Path(work_folder or temp_folder)
+
+        create_synthetic_project(work_folder.joinpath("Project"), asset_count)
+        run_config = create_run_config(work_folder, worker_count, settings)
+
+        results = {}
+        for each_run in ["cold", "warm"]:
+            timings, extracted_count = run_pipeline(run_config)
+
+            results[each_run] = {
+                "seconds": timings,
+                "extracted_packages": extracted_count,
+                "assets_per_second": asset_count / max(timings["total"], 1e-9)
+            }
+
+    return results
+
+
+@click.command()
+@click.option('--assets', default=1000, help="Number of synthetic assets")
+@click.option('--workers', default=0, help="Number of extract workers, 0 picks from the cores and memory")
+@click.option('--startup_delay', default=0.0, help="Seconds the fake editor takes to start")
+@click.option('--asset_delay', default=0.0, help="Seconds the fake editor spends on each asset")
+@click.option('--work_folder', default="", help="Keeps the project, cache and artifacts in this folder")
+@click.option('--output', type=click.Choice(['text', 'json']), default='text', help="Output type.")
+def cli(assets, workers, startup_delay, asset_delay, work_folder, output):
+    """Benchmarks the package inspection pipeline with the fake editor"""
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = benchmark_pipeline(assets, workers, startup_delay, asset_delay, work_folder or None)
+
+    if output == 'text':
+        for each_run, each_result in results.items():
+            stages = ", ".join("{} {:.2f}s".format(stage, seconds) for stage, seconds in each_result["seconds"].items())
+            print("{}: {:.1f} assets/s, {} packages extracted ({})".format(each_run, each_result["assets_per_second"],
+                                                                           each_result["extracted_packages"], stages))
+    elif output == 'json':
+        print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    cli()
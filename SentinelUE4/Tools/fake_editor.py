@@ -0,0 +1,209 @@
+"""
+Stand in for the editor executable that emulates the package info commandlet.  It accepts the command line that
+BaseUE4Commandlet.get_command builds and prints a package summary for every asset that is passed in, so that the
+package inspection pipeline can be run and benchmarked without an editor
+
+Behaviour is controlled with environment variables:
+    SENTINEL_FAKE_EDITOR_STARTUP_DELAY   seconds before the first package is processed
+    SENTINEL_FAKE_EDITOR_ASSET_DELAY     seconds spent on every package
+    SENTINEL_FAKE_EDITOR_CRASH_ON        exits with an error when a package path contains this text
+"""
+
+import hashlib
+import os
+import pathlib
+import random
+import shlex
+import stat
+import sys
+import time
+
+STARTUP_DELAY_VARIABLE = "SENTINEL_FAKE_EDITOR_STARTUP_DELAY"
+ASSET_DELAY_VARIABLE = "SENTINEL_FAKE_EDITOR_ASSET_DELAY"
+CRASH_ON_VARIABLE = "SENTINEL_FAKE_EDITOR_CRASH_ON"
+
+CRASH_EXIT_CODE = 3
+
+# Size of the buffer the engine keeps its command line in, anything longer is cut off
+MAX_COMMAND_LINE_SIZE = 16384
+
+PACKAGE_EXTENSIONS = (".uasset", ".umap")
+
+CHAPTER_DIVIDER = "--------------------------------------------"
+
+# Asset naming prefix -> asset type, the same conventions most projects use
+ASSET_TYPES = {
+    "SM_": "StaticMesh",
+    "SK_": "SkeletalMesh",
+    "T_": "Texture2D",
+    "M_": "Material",
+    "MI_": "MaterialInstanceConstant",
+    "BP_": "Blueprint",
+    "A_": "SoundWave",
+}
+
+DEFAULT_ASSET_TYPE = "DataAsset"
+
+
+def get_command_line_tokens(arguments):
+    """
+    Expands a -CmdLineFile= argument into the arguments that are in the file, the same way the engine does.  The file
+    is appended to the command line and everything past MAX_COMMAND_LINE_SIZE characters is cut off
+    :return: list of arguments
+    """
+
+    command_line = []
+    appended_arguments = []
+    for each_argument in arguments:
+        if each_argument.lower().startswith("-cmdlinefile="):
+            command_line_file = each_argument.split("=", 1)[1].strip('"')
+            with open(command_line_file, encoding="utf-8") as f:
+                appended_arguments.append(f.read().strip())
+        else:
+            command_line.append(shlex.quote(each_argument) if os.name != "nt" else each_argument)
+
+    command_line = " ".join(command_line + appended_arguments)[:MAX_COMMAND_LINE_SIZE]
+
+    return shlex.split(command_line, posix=os.name != "nt")
+
+
+def get_asset_type(asset_name):
+
+    for each_prefix, each_type in ASSET_TYPES.items():
+        if asset_name.startswith(each_prefix):
+            return each_type
+
+    return DEFAULT_ASSET_TYPE
+
+
+def get_game_path(package_path):
+    """
+    :return: the path the engine uses for the package, /Game/... for anything in the content folder
+    """
+
+    package_path = pathlib.Path(package_path).as_posix()
+
+    if "/Content/" in package_path:
+        return "/Game/" + package_path.split("/Content/", 1)[1].rsplit(".", 1)[0]
+
+    return "/Game/" + pathlib.Path(package_path).stem
+
+
+def get_package_summary(package_path):
+    """
+    Generates the commandlet output for a package, the values are derived from the content so the same package
+    always gives the same output
+    :return: list of lines
+    """
+
+    package_path = pathlib.Path(package_path)
+    try:
+        package_size = package_path.stat().st_size
+        with open(package_path, "rb") as f:
+            seed = hashlib.md5(f.read(65536)).hexdigest()
+    except OSError:
+        package_size = 0
+        seed = hashlib.md5(str(package_path).encode("utf-8")).hexdigest()
+
+    generator = random.Random(seed)
+
+    game_path = get_game_path(package_path)
+    asset_name = package_path.stem
+    asset_type = get_asset_type(asset_name)
+
+    name_count = generator.randint(20, 400)
+    import_count = generator.randint(2, 60)
+    export_count = generator.randint(1, 30)
+
+    lines = [
+        "Package '{}' Summary".format(game_path),
+        CHAPTER_DIVIDER,
+        "\t         Filename: {}".format(package_path.as_posix()),
+        "\t     File Version: 522",
+        "\t   Engine Version: 4.26.2-0+++UE4+Release-4.26",
+        "\t   CompatVersion: 4.26.0-0+++UE4+Release-4.26",
+        "\t    Package Flags: 0x{:08X}".format(generator.choice([0x00000000, 0x00040000, 0x80040000])),
+        "\t        NameCount: {}".format(name_count),
+        "\t       NameOffset: {}".format(generator.randint(500, 2000)),
+        "\t      ImportCount: {}".format(import_count),
+        "\t     ImportOffset: {}".format(generator.randint(2000, 8000)),
+        "\t      ExportCount: {}".format(export_count),
+        "\t     ExportOffset: {}".format(generator.randint(8000, 16000)),
+        "\t  TotalHeaderSize: {}".format(min(package_size, generator.randint(4000, 40000))),
+        "\t     PackageSize: {}".format(package_size),
+        "\t             Guid: {}".format(seed.upper()),
+        "\t      Generations: 1",
+        "\t\t\t0) ExportCount={} NameCount={} ".format(export_count, name_count),
+        CHAPTER_DIVIDER,
+        "Packages referenced by {}:".format(game_path),
+    ]
+
+    referenced_packages = ["/Script/CoreUObject", "/Script/Engine"]
+    for i in range(generator.randint(0, 12)):
+        referenced_packages.append("/Game/Shared/{}_{}".format(generator.choice(list(ASSET_TYPES)).rstrip("_"),
+                                                                generator.randint(0, 5000)))
+
+    for i, each_package in enumerate(referenced_packages):
+        lines.append("\t{:>3}) {}".format(i, each_package))
+
+    lines.extend([
+        CHAPTER_DIVIDER,
+        "Asset Registry Size: {:>10}".format(generator.randint(100, 8000)),
+        "Number of assets with Asset Registry data: 1",
+        "\t  0) {}'{}.{}' ({} Tags)".format(asset_type, game_path, asset_name, 4),
+        '\t\t"AssetImportData": "[{{ "RelativeFilename" : "../../Source/{}.fbx", "Timestamp" : "{}", '
+        '"FileMD5" : "{}" }}]"'.format(asset_name, generator.randint(1500000000, 1700000000), seed),
+        '\t\t"FiBData": "{}"'.format(seed * 4),
+        '\t\t"NumReferencers": "{}"'.format(generator.randint(0, 50)),
+        '\t\t"SourceSize": "{}"'.format(package_size),
+        CHAPTER_DIVIDER,
+    ])
+
+    return lines
+
+
+def main(arguments):
+
+    tokens = get_command_line_tokens(arguments)
+    package_paths = [each_token for each_token in tokens if each_token.lower().endswith(PACKAGE_EXTENSIONS)]
+
+    startup_delay = float(os.environ.get(STARTUP_DELAY_VARIABLE, "0"))
+    asset_delay = float(os.environ.get(ASSET_DELAY_VARIABLE, "0"))
+    crash_on = os.environ.get(CRASH_ON_VARIABLE, "")
+
+    print("LogInit: Display: Running engine for game: FakeProject")
+    print("LogInit: Display: Command Line: " + " ".join(tokens))
+    time.sleep(startup_delay)
+
+    for each_package in package_paths:
+        if crash_on and crash_on in each_package:
+            print("LogWindows: Error: === Critical error: ===", flush=True)
+            return CRASH_EXIT_CODE
+
+        time.sleep(asset_delay)
+        print("\n".join(get_package_summary(each_package)))
+
+    print("LogInit: Display: Success - 0 error(s), 0 warning(s)")
+    return 0
+
+
+def write_launcher(launcher_path):
+    """
+    Writes an executable at the path that runs this emulator, used to put it where the editor executable is expected
+    """
+
+    launcher_path = pathlib.Path(launcher_path)
+    os.makedirs(launcher_path.parent, exist_ok=True)
+
+    with open(launcher_path, "w") as f:
+        f.write("#!{}\n".format(sys.executable))
+        f.write("import sys\n")
+        f.write("sys.path.insert(0, {!r})\n".format(str(pathlib.Path(__file__).resolve().parent)))
+        f.write("import fake_editor\n")
+        f.write("sys.exit(fake_editor.main(sys.argv[1:]))\n")
+
+    os.chmod(launcher_path, os.stat(launcher_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
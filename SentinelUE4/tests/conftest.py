@@ -0,0 +1,5 @@
+import pathlib
+import sys
+
+# The pipeline modules are imported from the component root, the same way the tools scripts import them
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from Editor import packageinspection, sentinelcache
+from Tools import benchmark_pipeline, fake_editor
+
+
+def create_project(work_folder, asset_count, bad_assets=()):
+    """
+    Writes a synthetic project, the assets at the given positions of the list sorted by size are renamed so that the
+    fake editor crashes on them
+    :return: run config, list of the asset paths
+    """
+
+    asset_paths = benchmark_pipeline.create_synthetic_project(work_folder.joinpath("Project"), asset_count)
+
+    assets_by_size = sorted(asset_paths, key=os.path.getsize)
+    for each_position in bad_assets:
+        bad_path = assets_by_size[each_position]
+        renamed_path = bad_path.with_name("BAD_" + bad_path.name)
+        os.replace(bad_path, renamed_path)
+        asset_paths[asset_paths.index(bad_path)] = renamed_path
+
+    run_config = benchmark_pipeline.create_run_config(work_folder, 1)
+
+    return run_config, asset_paths
+
+
+def run_inspection(run_config):
+
+    inspector = packageinspection.BasePackageInspection(run_config)
+    inspector.run()
+
+    return inspector
+
+
+def get_bad_package_names(run_config):
+
+    cache_path = run_config["environment"][sentinelcache.ue4_constants.SENTINEL_CACHE_ROOT]
+    return sorted(os.path.basename(each_entry["path"])
+                  for each_entry in sentinelcache.BadPackageList(cache_path).get_entries().values())
+
+
+@pytest.fixture
+def fake_editor_environment(monkeypatch):
+
+    monkeypatch.setenv(fake_editor.STARTUP_DELAY_VARIABLE, "0")
+    monkeypatch.setenv(fake_editor.ASSET_DELAY_VARIABLE, "0")
+    monkeypatch.setenv(fake_editor.CRASH_ON_VARIABLE, "BAD_")
+
+
+def test_bad_package_in_each_half_of_a_chunk(tmp_path, fake_editor_environment):
+
+    # The smallest and the largest asset end up in different halves of the only chunk
+    run_config, asset_paths = create_project(tmp_path, 8, bad_assets=(0, -1))
+    bad_names = sorted(each_path.name for each_path in asset_paths if each_path.name.startswith("BAD_"))
+
+    inspector = run_inspection(run_config)
+
+    assert len(inspector.extracted_files) == 6
+    assert get_bad_package_names(run_config) == bad_names
+
+    # The bad packages are skipped until their content changes
+    inspector = run_inspection(run_config)
+
+    assert len(inspector.extracted_files) == 0
+    assert get_bad_package_names(run_config) == bad_names
+
+
+def test_editor_failing_on_every_package_stops_the_run(tmp_path, monkeypatch, fake_editor_environment):
+
+    run_config, asset_paths = create_project(tmp_path, 16)
+    monkeypatch.setenv(fake_editor.CRASH_ON_VARIABLE, "Asset_")
+
+    with pytest.raises(SystemExit):
+        run_inspection(run_config)
+
+    assert get_bad_package_names(run_config) == []
+
+
+def test_failed_chunk_only_retries_unfinished_packages(tmp_path):
+
+    run_config, asset_paths = create_project(tmp_path, 6)
+    hash_mapping = packageinspection.create_project_hash_map(run_config, asset_paths)
+
+    run_object = packageinspection.PackageInfoCommandlet(run_config, asset_paths, 0, hash_mapping)
+
+    # The editor wrote the first three packages and stopped while writing the third
+    run_object.output_files = [run_object.package_log_path.joinpath(hash_mapping.get_hash_from_filename(each_path) +
+                                                                   sentinelcache.CACHE_ENTRY_EXTENSION)
+                               for each_path in asset_paths[:3]]
+
+    assert run_object.has_failed()
+    assert run_object.get_complete_output_files() == run_object.output_files[:2]
+    assert run_object.get_files_to_retry() == asset_paths[2:]
+
+
+def test_deleted_cache_entry_is_extracted_again(tmp_path, fake_editor_environment):
+
+    run_config, asset_paths = create_project(tmp_path, 4)
+    inspector = run_inspection(run_config)
+    assert len(inspector.extracted_files) == 4
+
+    cache_path = run_config["environment"][sentinelcache.ue4_constants.SENTINEL_CACHE_ROOT]
+    lost_hash_value = inspector.hash_mapping.get_hash_from_filename(asset_paths[0])
+    manifest = sentinelcache.CacheManifest(cache_path)
+    os.remove(manifest.get_entry_path(lost_hash_value))
+
+    inspector = run_inspection(run_config)
+
+    assert [each_file.name for each_file in inspector.extracted_files] == [
+        lost_hash_value + sentinelcache.CACHE_ENTRY_EXTENSION]
+    assert sentinelcache.CacheManifest(cache_path).get_entry_path(lost_hash_value).exists()
+
+
+def test_warm_run_with_compression_keeps_one_log_per_package(tmp_path, fake_editor_environment):
+
+    run_config, asset_paths = create_project(tmp_path, 6)
+    settings = run_config[sentinelcache.ue4_constants.PACKAGE_INSPECTION_SETTINGS]
+    settings[sentinelcache.ue4_constants.CACHE_COMPRESSION] = "gzip"
+
+    for each_run in range(2):
+        inspector = run_inspection(run_config)
+        converter = packageinspection.PackageLogConverter(run_config, inspector.hash_mapping)
+        converter.run()
+
+        raw_logs = list(converter.raw_folder.iterdir())
+        assert len(raw_logs) == 6
+        assert converter.stats["converted"] + converter.stats["skipped"] == 6
@@ -0,0 +1,186 @@
+import socket
+import threading
+
+import pytest
+
+from Editor import remotecache, sentinelcache
+
+
+def get_hash_value(number):
+    return "{:032x}".format(number)
+
+
+def write_packed_cache(cache_path, entries):
+    """
+    :param entries: dict of hash value -> data, stored in a pack
+    """
+
+    writer = sentinelcache.PackWriter(cache_path.joinpath(sentinelcache.PACK_FOLDER_NAME))
+    for each_hash, each_data in entries.items():
+        writer.add(each_hash, sentinelcache.CACHE_ENTRY_EXTENSION, each_data)
+    writer.close()
+
+
+def read_local_entry(cache_path, hash_value):
+    return sentinelcache.CacheManifest(cache_path).get_entry_path(hash_value).read_bytes()
+
+
+@pytest.fixture
+def cache_server(tmp_path):
+    """
+    Serves a cache folder on a free port
+    :return: tuple of the served folder and the url of the server
+    """
+
+    served_path = tmp_path.joinpath("Served")
+    served_path.mkdir()
+
+    server = remotecache.create_cache_server(served_path, 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield served_path, "http://{}:{}".format(*server.server_address)
+
+    server.shutdown()
+    server.server_close()
+    if remotecache.CacheRequestHandler.packs:
+        remotecache.CacheRequestHandler.packs.close()
+
+
+def test_filesystem_remote_cache_fetches_packed_entries(tmp_path):
+
+    entries = {get_hash_value(i): "entry {}".format(i).encode() for i in range(3)}
+    write_packed_cache(tmp_path.joinpath("Remote"), entries)
+
+    local_manifest = sentinelcache.CacheManifest(tmp_path.joinpath("Local"))
+    remote_cache = remotecache.FileSystemRemoteCache(str(tmp_path.joinpath("Remote")), worker_count=2)
+
+    fetched_hash_values = remote_cache.fetch_entries(list(entries) + [get_hash_value(99)], local_manifest)
+
+    assert sorted(fetched_hash_values) == sorted(entries)
+    for each_hash, each_data in entries.items():
+        assert read_local_entry(local_manifest.cache_path, each_hash) == each_data
+
+
+def test_cache_server_serves_packed_entries(tmp_path, cache_server):
+
+    served_path, url = cache_server
+    entries = {get_hash_value(i): "entry {}".format(i).encode() for i in range(3)}
+    write_packed_cache(served_path, entries)
+
+    local_manifest = sentinelcache.CacheManifest(tmp_path.joinpath("Local"))
+    remote_cache = remotecache.HttpRemoteCache(url, worker_count=2, timeout=5)
+
+    assert sorted(remote_cache.get_existing_entries(list(entries) + [get_hash_value(99)])) == sorted(entries)
+
+    remote_cache.fetch_entries(list(entries), local_manifest)
+
+    for each_hash, each_data in entries.items():
+        assert read_local_entry(local_manifest.cache_path, each_hash) == each_data
+
+
+def write_local_entries(cache_path, entries):
+    """
+    :param entries: dict of hash value -> data, stored as loose entries
+    :return: paths of the entries
+    """
+
+    manifest = sentinelcache.CacheManifest(cache_path)
+    entry_paths = []
+    for each_hash, each_data in entries.items():
+        entry_path = sentinelcache.get_cache_entry_path(cache_path, each_hash, sentinelcache.CACHE_ENTRY_EXTENSION)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        entry_path.write_bytes(each_data)
+        entry_paths.append(entry_path)
+
+    manifest.add([each_path.name for each_path in entry_paths])
+
+    return entry_paths
+
+
+def test_filesystem_remote_cache_upload_and_fetch(tmp_path):
+
+    entries = {get_hash_value(i): "entry {}".format(i).encode() for i in range(3)}
+    entry_paths = write_local_entries(tmp_path.joinpath("Uploader"), entries)
+
+    remotecache.FileSystemRemoteCache(str(tmp_path.joinpath("Remote"))).upload_entries(entry_paths)
+
+    local_manifest = sentinelcache.CacheManifest(tmp_path.joinpath("Local"))
+    remote_cache = remotecache.FileSystemRemoteCache(str(tmp_path.joinpath("Remote")), worker_count=2)
+
+    assert sorted(remote_cache.fetch_entries(list(entries), local_manifest)) == sorted(entries)
+    for each_hash, each_data in entries.items():
+        assert read_local_entry(local_manifest.cache_path, each_hash) == each_data
+
+
+def test_filesystem_remote_cache_never_moves_remote_entries(tmp_path):
+
+    remote_path = tmp_path.joinpath("Remote")
+    write_local_entries(remote_path, {get_hash_value(2): b"sharded entry"})
+    remote_path.joinpath(sentinelcache.MANIFEST_FILE_NAME).unlink()
+
+    flat_entry_path = remote_path.joinpath(get_hash_value(1) + sentinelcache.CACHE_ENTRY_EXTENSION)
+    flat_entry_path.write_bytes(b"flat entry")
+
+    remote_cache = remotecache.FileSystemRemoteCache(str(remote_path))
+
+    assert list(remote_cache.get_existing_entries([get_hash_value(1), get_hash_value(2)])) == [get_hash_value(2)]
+    assert flat_entry_path.read_bytes() == b"flat entry"
+    assert not list(remote_path.glob("*.tmp"))
+
+
+def test_cache_server_upload_and_fetch(tmp_path, cache_server):
+
+    served_path, url = cache_server
+    entries = {get_hash_value(i): "entry {}".format(i).encode() for i in range(3)}
+    entry_paths = write_local_entries(tmp_path.joinpath("Uploader"), entries)
+
+    remotecache.HttpRemoteCache(url, worker_count=2, timeout=5).upload_entries(entry_paths)
+
+    local_manifest = sentinelcache.CacheManifest(tmp_path.joinpath("Local"))
+    remote_cache = remotecache.HttpRemoteCache(url, worker_count=2, timeout=5)
+
+    assert sorted(remote_cache.fetch_entries(list(entries), local_manifest)) == sorted(entries)
+    for each_hash, each_data in entries.items():
+        assert read_local_entry(local_manifest.cache_path, each_hash) == each_data
+
+
+def test_cache_server_rejects_partial_upload(cache_server):
+
+    served_path, url = cache_server
+    entry_name = get_hash_value(1) + sentinelcache.CACHE_ENTRY_EXTENSION
+    host, port = url[len("http://"):].split(":")
+
+    # The connection closes after half of the entry was sent
+    with socket.create_connection((host, int(port)), timeout=5) as connection:
+        connection.sendall("PUT /entries/{} HTTP/1.1\r\nHost: {}\r\nContent-Length: 100\r\n\r\n".format(
+            entry_name, host).encode() + b"x" * 50)
+        connection.shutdown(socket.SHUT_WR)
+        response = connection.makefile("rb").readline()
+
+    assert response.split()[1] == b"400"
+    assert not sentinelcache.get_cache_entry_path(served_path, get_hash_value(1),
+                                                  sentinelcache.CACHE_ENTRY_EXTENSION).exists()
+    assert not list(served_path.rglob("*.tmp"))
+    assert not remotecache.HttpRemoteCache(url, timeout=5).get_existing_entries([get_hash_value(1)])
+
+
+def test_cache_server_rejects_upload_without_token(tmp_path):
+
+    served_path = tmp_path.joinpath("Served")
+    server = remotecache.create_cache_server(served_path, 0, upload_token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        entry_paths = write_local_entries(tmp_path.joinpath("Uploader"), {get_hash_value(1): b"entry"})
+        url = "http://{}:{}".format(*server.server_address)
+
+        remotecache.HttpRemoteCache(url, timeout=5).upload_entries(entry_paths)
+        assert not remotecache.HttpRemoteCache(url, timeout=5).get_existing_entries([get_hash_value(1)])
+
+        remotecache.HttpRemoteCache(url, timeout=5, token="secret").upload_entries(entry_paths)
+        assert remotecache.HttpRemoteCache(url, timeout=5).get_existing_entries([get_hash_value(1)])
+    finally:
+        server.shutdown()
+        server.server_close()
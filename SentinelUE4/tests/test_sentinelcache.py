@@ -0,0 +1,194 @@
+import json
+
+import pytest
+
+from Editor import sentinelcache
+
+
+def get_hash_value(number):
+    return "{:032x}".format(number)
+
+
+def write_pack(pack_folder, entries):
+    """
+    :param entries: dict of hash value -> data
+    :return: PackReader for the written pack
+    """
+
+    writer = sentinelcache.PackWriter(pack_folder)
+    for each_hash, each_data in entries.items():
+        writer.add(each_hash, sentinelcache.CACHE_ENTRY_EXTENSION, each_data)
+    writer.close()
+
+    return sentinelcache.PackReader(writer.index_path)
+
+
+def add_loose_entry(cache_path, manifest, hash_value, data):
+
+    entry_path = sentinelcache.get_cache_entry_path(cache_path, hash_value)
+    entry_path.parent.mkdir(parents=True, exist_ok=True)
+    entry_path.write_bytes(data)
+
+    manifest.add([hash_value + sentinelcache.CACHE_ENTRY_EXTENSION])
+
+
+def test_pack_round_trip(tmp_path):
+
+    entries = {get_hash_value(i * 10): "entry {}".format(i).encode() * (i + 1) for i in range(1, 50)}
+    reader = write_pack(tmp_path, entries)
+
+    try:
+        assert reader.entry_count == len(entries)
+
+        for each_hash, each_data in entries.items():
+            extension, offset, length = reader.find(each_hash)
+            assert extension == sentinelcache.CACHE_ENTRY_EXTENSION
+            assert reader.read(offset, length) == each_data
+    finally:
+        reader.close()
+
+
+@pytest.mark.parametrize("hash_value", [
+    get_hash_value(15),  # Between two records
+    get_hash_value(0),  # Sorts before the first record
+    "f" * 32,  # Sorts after the last record
+    get_hash_value(10)[:-1],  # Prefix of a record
+])
+def test_pack_find_missing_key(tmp_path, hash_value):
+
+    reader = write_pack(tmp_path, {get_hash_value(i * 10): b"data" for i in range(1, 5)})
+
+    try:
+        assert reader.find(hash_value) is None
+    finally:
+        reader.close()
+
+
+def test_manifest_skips_cut_off_line(tmp_path):
+
+    manifest = sentinelcache.CacheManifest(tmp_path)
+    manifest.add([get_hash_value(1) + ".log", get_hash_value(2) + ".log.gz", get_hash_value(3) + ".log"])
+    manifest.remove([get_hash_value(3)])
+
+    # An interrupted run leaves the last line without a line break
+    with open(manifest.manifest_path, "a", encoding="utf-8") as f:
+        f.write("+" + get_hash_value(4)[:10])
+
+    entries = sentinelcache.CacheManifest(tmp_path).get_entries()
+
+    assert entries == {get_hash_value(1): ".log", get_hash_value(2): ".log.gz"}
+
+
+def test_repack_keeps_most_recently_used_entries_within_budget(tmp_path):
+
+    entry_size = 100
+    pack_entries = {get_hash_value(i): bytes([i]) * entry_size for i in range(4)}
+    loose_entries = {get_hash_value(i): bytes([i]) * entry_size for i in range(4, 6)}
+
+    write_pack(tmp_path.joinpath(sentinelcache.PACK_FOLDER_NAME), pack_entries).close()
+
+    manifest = sentinelcache.CacheManifest(tmp_path)
+    for each_hash, each_data in loose_entries.items():
+        add_loose_entry(tmp_path, manifest, each_hash, each_data)
+
+    # Higher numbers were used more recently
+    access_times = {get_hash_value(i): 1000.0 + i for i in range(6)}
+    tmp_path.joinpath(sentinelcache.ACCESS_LOG_FILE_NAME).write_text(json.dumps(access_times))
+
+    result = sentinelcache.repack(tmp_path, max_bytes=3 * entry_size + entry_size // 2)
+
+    assert result["entries_packed"] == 3
+    assert result["entries_evicted"] == 3
+    assert result["bytes_in_cache"] == 3 * entry_size
+
+    packs = sentinelcache.CachePacks(tmp_path)
+    try:
+        assert len(packs.get_readers()) == 1
+
+        all_entries = dict(pack_entries, **loose_entries)
+        for i in range(6):
+            hash_value = get_hash_value(i)
+            if i < 3:
+                assert hash_value not in packs
+                continue
+
+            reader, (extension, offset, length) = packs.find(hash_value)
+            assert reader.read(offset, length) == all_entries[hash_value]
+    finally:
+        packs.close()
+
+    # The loose entries were moved into the pack
+    assert not list(sentinelcache.CacheManifest(tmp_path).get_hash_values())
+    for each_hash in loose_entries:
+        assert not sentinelcache.get_cache_entry_path(tmp_path, each_hash).exists()
+
+    access_log = sentinelcache.CacheAccessLog(tmp_path)
+    assert access_log.get_access_time(get_hash_value(0), None) is None
+    assert access_log.get_access_time(get_hash_value(5)) == 1005.0
+
+
+def test_repack_right_after_writing_a_pack(tmp_path, monkeypatch):
+
+    # Both packs are written within the same millisecond
+    monkeypatch.setattr(sentinelcache.time, "time", lambda: 1000.0)
+
+    hash_value = get_hash_value(1)
+    write_pack(tmp_path.joinpath(sentinelcache.PACK_FOLDER_NAME), {hash_value: b"data"}).close()
+
+    sentinelcache.repack(tmp_path)
+
+    packs = sentinelcache.CachePacks(tmp_path)
+    try:
+        assert hash_value in packs
+    finally:
+        packs.close()
+
+
+def test_manifest_is_compacted_when_most_lines_are_dead(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(sentinelcache, "MANIFEST_COMPACT_MIN_DEAD_LINES", 10)
+
+    manifest = sentinelcache.CacheManifest(tmp_path)
+    manifest.add([get_hash_value(0) + ".log"])
+    for i in range(1, 20):
+        manifest.add([get_hash_value(i) + ".log"])
+        manifest.remove([get_hash_value(i)])
+
+    lines = manifest.manifest_path.read_text().splitlines()
+
+    assert len(lines) < 20
+    assert sentinelcache.CacheManifest(tmp_path).get_entries() == {get_hash_value(0): ".log"}
+
+
+def test_packed_garbage_collection_repacks_below_the_budget(tmp_path):
+
+    entry_size = 100
+    entries = {get_hash_value(i): bytes([i]) * entry_size for i in range(10)}
+    write_pack(tmp_path.joinpath(sentinelcache.PACK_FOLDER_NAME), entries).close()
+
+    access_times = {get_hash_value(i): 1000.0 + i for i in range(10)}
+    tmp_path.joinpath(sentinelcache.ACCESS_LOG_FILE_NAME).write_text(json.dumps(access_times))
+
+    result = sentinelcache.collect_garbage(tmp_path, 9 * entry_size, repack_target_ratio=0.8)
+
+    assert result["entries_evicted"] == 3
+    assert result["bytes_in_cache"] == 7 * entry_size
+
+    # The next run has room for new entries without rewriting the packs again
+    result = sentinelcache.collect_garbage(tmp_path, 9 * entry_size, repack_target_ratio=0.8)
+
+    assert result["entries_evicted"] == 0
+    assert result["bytes_freed"] == 0
+
+
+def test_packing_removes_empty_shard_folders(tmp_path):
+
+    manifest = sentinelcache.CacheManifest(tmp_path)
+    hash_values = [get_hash_value(i) for i in range(1, 4)]
+    for each_hash in hash_values:
+        add_loose_entry(tmp_path, manifest, each_hash, b"data")
+
+    sentinelcache.pack_loose_entries(tmp_path, hash_values)
+
+    assert sorted(each_path.name for each_path in tmp_path.iterdir() if each_path.is_dir()) == [
+        sentinelcache.PACK_FOLDER_NAME]
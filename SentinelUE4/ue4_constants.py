@@ -39,4 +39,29 @@ UNREAL_BUILD_CONFIG_FLAGS = "build_flags"
 UNREAL_BUILD_CONFIGURATION = "build_configuration"
 UNREAL_EDITOR_COMPILE_CONFIGURATION = "editorbuildconfig"
 
-
+PACKAGE_INSPECTION_SETTINGS = "package_inspection"
+HASH_WORKERS = "hash_workers"
+HASH_USE_PROCESSES = "hash_use_processes"
+HASH_ALGORITHM = "hash_algorithm"
+HASH_READ_SIZE = "hash_read_size"
+HASH_MMAP_THRESHOLD = "hash_mmap_threshold"
+CACHE_MATERIALIZATION = "cache_materialization"
+CACHE_COMPRESSION = "cache_compression"
+CACHE_MAX_BYTES = "cache_max_bytes"
+CACHE_GC_AFTER_REFRESH = "cache_gc_after_refresh"
+CACHE_STORAGE = "cache_storage"
+CACHE_REPACK_TARGET_RATIO = "cache_repack_target_ratio"
+REMOTE_CACHE = "remote_cache"
+REMOTE_CACHE_WORKERS = "remote_cache_workers"
+REMOTE_CACHE_UPLOAD = "remote_cache_upload"
+REMOTE_CACHE_TIMEOUT = "remote_cache_timeout"
+REMOTE_CACHE_TOKEN = "remote_cache_token"
+EXTRACT_WORKERS = "extract_workers"
+EXTRACT_WORKER_MEMORY_MB = "extract_worker_memory_mb"
+EXTRACT_CHUNK_OVERHEAD_SECONDS = "extract_chunk_overhead_seconds"
+EXTRACT_CHUNKS_PER_WORKER = "extract_chunks_per_worker"
+EXTRACT_COMMAND_LINE_LIMIT = "extract_command_line_limit"
+EXTRACT_ENGINE_COMMAND_LINE_LIMIT = "extract_engine_command_line_limit"
+SPLIT_WORKERS = "split_workers"
+CONVERT_WORKERS = "convert_workers"
+CONVERT_BATCH_SIZE = "convert_batch_size"